@@ -0,0 +1,36 @@
+# --- Benchmark: motore CPM (infratrack.cpm.compute_cpm) ---
+# Uso: python benchmarks/bench_cpm.py [n_attività ...]   (default: 10000 50000 100000)
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from infratrack.calendars import compile_calendar, default_calendar_spec
+from infratrack.cpm import compute_cpm
+
+
+def synthetic_network(n_tasks, links_per_task=1.5, max_back=50, seed=42):
+    # Attività foglia con durate 0-30 giorni; ogni link punta a un'attività precedente (rete aciclica)
+    rng = np.random.default_rng(seed)
+    task_table = pd.DataFrame({"UID": np.arange(1, n_tasks + 1).astype(str), "WBS": [f"1.{i}" for i in range(1, n_tasks + 1)],
+                               "Summary": False, "DurationSeconds": rng.integers(0, 31, n_tasks) * 8 * 3600.0})
+    n_links = int(n_tasks * links_per_task)
+    successor = rng.integers(1, n_tasks, n_links); predecessor = successor - rng.integers(1, np.minimum(successor, max_back) + 1)
+    link_columns = {'SuccessorUID': (successor + 1).astype(str).tolist(), 'PredecessorUID': (predecessor + 1).astype(str).tolist(),
+                    'Type': rng.choice(['1', '1', '1', '0', '2', '3'], n_links).tolist(), 'LinkLag': rng.choice(['0', '0', '4800', '-2400'], n_links).tolist(),
+                    'LagFormat': ['7'] * n_links}
+    return task_table, link_columns
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 50000, 100000]
+    calendar = compile_calendar(default_calendar_spec())
+    print(f"{'attività':>10} {'link':>10} {'critiche':>10} {'secondi':>10}")
+    for n in sizes:
+        task_table, link_columns = synthetic_network(n)
+        t0 = time.perf_counter(); result = compute_cpm(task_table, link_columns, 480, date(2025, 1, 1), calendar); elapsed = time.perf_counter() - t0
+        print(f"{n:>10} {len(link_columns['SuccessorUID']):>10} {int((result['CPMTotalSlackDays'] <= 0).sum()):>10} {elapsed:>10.3f}")
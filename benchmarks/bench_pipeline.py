@@ -0,0 +1,140 @@
+# --- Benchmark: tutte le fasi della pipeline su file MSPDI sintetici (o su baseline reali) ---
+# Uso: python benchmarks/bench_pipeline.py [n_attività ...] [--file BASELINE.xml ...] [--repeat N]
+#      [--output risultati.json] [--compare precedente.json] [--tolerance 0.2] [--min-seconds 0.05]
+# Per ogni file e ogni fase: tempo migliore e mediano su --repeat esecuzioni, picco di memoria allocata
+# (tracemalloc, misurato in un'esecuzione separata per non falsare i tempi). I risultati sono salvati in
+# JSON con versione di InfraTrack/Python/librerie e parametri del generatore: con --compare le fasi più lente
+# oltre la tolleranza sono segnalate come regressioni (codice di uscita 1).
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from infratrack import __version__
+from infratrack import loader
+from infratrack.analysis import build_project_index, scurve_analysis, aggregate_resource_histogram, filter_critical_tasks
+from infratrack.calendars import resolve_calendars, project_calendars
+from infratrack.report import build_project_report
+from infratrack.resources import RESOURCE_TYPES
+from infratrack.scurve import distribute_costs
+from infratrack.sil import get_tasks_to_distribute_for_sil
+from infratrack.tasks import build_task_table
+from infratrack.timephased import build_timephased_work
+from mspdi_generator import generate_mspdi
+
+DEFAULT_SIZES = [2000, 20000]
+
+
+def pipeline_stages(path):
+    # (nome fase, funzione senza argomenti); ogni fase riceve i risultati delle precedenti, calcolati una volta qui
+    scanned = loader.scan_project(path)
+    project_data = loader.load_project(path)
+    all_tasks_data = project_data['all_tasks_data']; tasks_to_distribute = get_tasks_to_distribute_for_sil(all_tasks_data)
+    calendars, project_calendar_uid = project_calendars(project_data); resolved_calendars = resolve_calendars(scanned['calendar_specs'])
+    project_index = build_project_index(project_data)
+    start_date, finish_date = project_data['project_start_date'], project_data['project_finish_date']
+
+    def histograms():
+        for aggregation_level in ('Mensile', 'Giornaliera'):
+            for resource_type in RESOURCE_TYPES: aggregate_resource_histogram(project_index, resource_type, start_date, finish_date, aggregation_level)
+
+    return [
+        ('parse', lambda: loader.scan_project(path)),
+        ('task_extraction', lambda: build_task_table(scanned['task_columns'], loader.DEFAULT_MINUTES_PER_DAY)),
+        ('load_project', lambda: loader.load_project(path)),
+        ('sil_selection', lambda: get_tasks_to_distribute_for_sil(all_tasks_data)),
+        ('cost_distribution', lambda: distribute_costs(tasks_to_distribute, calendars, project_calendar_uid)),
+        ('timephased_work', lambda: build_timephased_work(scanned['timephased_columns'], scanned['resource_map'], scanned['resource_calendars'], resolved_calendars, project_calendar_uid)),
+        ('project_index', lambda: build_project_index(project_data)),
+        ('scurve_monthly', lambda: scurve_analysis(project_index, project_data['wbs_name_map'], start_date, finish_date, 'Mensile')),
+        ('scurve_daily', lambda: scurve_analysis(project_index, project_data['wbs_name_map'], start_date, finish_date, 'Giornaliera')),
+        ('histograms', histograms),
+        ('critical_path', lambda: filter_critical_tasks(project_index, all_tasks_data, 0, start_date, finish_date)),
+        ('excel_export', lambda: build_project_report(project_data, BytesIO(), start_date, finish_date, 'Mensile', 0, project_index=project_index)),
+    ]
+
+
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); function(); times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try: function(); _, peak = tracemalloc.get_traced_memory()
+    finally: tracemalloc.stop()
+    return {'seconds': min(times), 'median_seconds': statistics.median(times), 'peak_mb': peak / 2 ** 20}
+
+
+def run_file(path, repeat, generator=None):
+    entry = {'file': os.path.basename(path), 'size_mb': os.path.getsize(path) / 2 ** 20, 'generator': generator, 'stages': {}}
+    print(f"\n{entry['file']} ({entry['size_mb']:.1f} MB)"); print(f"{'fase':<18} {'secondi':>10} {'mediana':>10} {'picco MB':>10}")
+    for name, function in pipeline_stages(path):
+        result = entry['stages'][name] = measure(function, repeat)
+        print(f"{name:<18} {result['seconds']:>10.3f} {result['median_seconds']:>10.3f} {result['peak_mb']:>10.1f}")
+    return entry
+
+
+def environment():
+    return {'infratrack': __version__, 'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'lxml': etree.__version__, 'platform': platform.platform(), 'timestamp': datetime.now().isoformat(timespec='seconds')}
+
+
+def compare_runs(current, previous, tolerance, min_seconds=0.05):
+    # Confronto per (file, fase) sui tempi migliori e sui picchi di memoria; restituisce le righe in regressione.
+    # Le fasi che restano sotto min_seconds (rumore di misura) non sono mai segnalate per il tempo
+    previous_stages = {(run['file'], name): stage for run in previous['runs'] for name, stage in run['stages'].items()}
+    regressions = []
+    print(f"\nConfronto con {previous['environment'].get('infratrack')} del {previous['environment'].get('timestamp')} (tolleranza {tolerance:.0%})")
+    print(f"{'file':<28} {'fase':<18} {'tempo':>8} {'memoria':>8}")
+    for run in current['runs']:
+        for name, stage in run['stages'].items():
+            old = previous_stages.get((run['file'], name))
+            if old is None: continue
+            time_ratio = stage['seconds'] / max(old['seconds'], 1e-9); memory_ratio = stage['peak_mb'] / max(old['peak_mb'], 1e-9)
+            slower = (time_ratio > 1 + tolerance and stage['seconds'] >= min_seconds) or memory_ratio > 1 + tolerance
+            print(f"{run['file']:<28} {name:<18} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x{'  REGRESSIONE' if slower else ''}")
+            if slower: regressions.append((run['file'], name, time_ratio, memory_ratio))
+    return regressions
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark delle fasi della pipeline InfraTrack.")
+    parser.add_argument('sizes', nargs='*', type=int, help=f"Numero di attività dei file sintetici (default {' '.join(map(str, DEFAULT_SIZES))}).")
+    parser.add_argument('--file', action='append', default=[], help="Baseline reale da misurare (ripetibile); senza sizes esclude i file sintetici.")
+    parser.add_argument('--repeat', type=int, default=3, help="Esecuzioni cronometrate per fase (default 3).")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="File JSON dei risultati.")
+    parser.add_argument('--compare', help="JSON di un'esecuzione precedente da confrontare.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Rallentamento ammesso prima di segnalare una regressione (default 0.2 = 20%%).")
+    parser.add_argument('--min-seconds', type=float, default=0.05, help="Durata sotto la quale il tempo di una fase non è confrontato (default 0.05).")
+    return parser
+
+
+if __name__ == '__main__':
+    args = build_arg_parser().parse_args()
+    sizes = args.sizes or ([] if args.file else DEFAULT_SIZES)
+    results = {'environment': environment(), 'repeat': args.repeat, 'runs': []}
+    with tempfile.TemporaryDirectory(prefix='infratrack_bench_') as work_dir:
+        for n_tasks in sizes:
+            path = os.path.join(work_dir, f"sintetico_{n_tasks}_seed{args.seed}.xml")
+            generator = {'n_tasks': n_tasks, 'seed': args.seed, **generate_mspdi(path, n_tasks, seed=args.seed)}
+            results['runs'].append(run_file(path, args.repeat, generator))
+        for path in args.file: results['runs'].append(run_file(path, args.repeat))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: json.dump(results, f, indent=2)
+        print(f"\nRisultati salvati in {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f: previous = json.load(f)
+        if compare_runs(results, previous, args.tolerance, args.min_seconds): sys.exit(1)
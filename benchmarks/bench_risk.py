@@ -0,0 +1,65 @@
+# --- Benchmark: simulazione Monte Carlo dei rischi di programma (infratrack.risk) ---
+# Uso: python benchmarks/bench_risk.py [n_attività ...] [--file BASELINE.xml ...] [--iterations 10000] [--workers 1 4 8]
+# Per ogni file: tempo di preparazione del modello e della simulazione per ogni numero di processi (il risultato
+# a parità di seme è lo stesso, verificato sulla fine progetto P80). Prima dei tempi, verifica a moltiplicatori unitari:
+# ogni iterazione deve dare per ogni TUP/TUF il giorno del CPM deterministico (cpm.compute_schedule con gli inizi da
+# programma), quindi probabilità 100% dove quel giorno rispetta il termine del file e 0% dove lo supera
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from infratrack import loader
+from infratrack.analysis import build_project_index
+from infratrack.risk import (DEFAULT_ITERATIONS, RISK_WORKERS, build_risk_model, simulate_schedule_risk, project_finish_summary, milestone_risk_table,
+                             scheduled_milestone_days)
+from mspdi_generator import generate_mspdi
+
+
+UNIT_PROFILE = {'name': 'Durate da programma', 'default': {'distribution': 'pert', 'optimistic': 1.0, 'most_likely': 1.0, 'pessimistic': 1.0}, 'rules': []}
+
+
+def check_unit_multipliers(project_data, project_index, iterations=100):
+    # Simulazione senza variabilità contro il CPM deterministico e contro le date di fine del file
+    model = build_risk_model(project_data, project_index, UNIT_PROFILE); result = simulate_schedule_risk(model, iterations, workers=1)
+    expected_days = scheduled_milestone_days(model); deadline_days = model['deadline_days']
+    same_days = np.all((result['milestone_days'] == expected_days) | (np.isnan(result['milestone_days']) & np.isnan(expected_days)))
+    valid = ~np.isnan(expected_days) & ~np.isnan(deadline_days)
+    expected = np.where(expected_days[valid] <= deadline_days[valid], 100.0, 0.0)
+    probability = milestone_risk_table(model, result)['Probabilità Rispetto (%)'].to_numpy(dtype=float)[valid] if valid.any() else expected
+    if not same_days or not np.array_equal(probability, expected):
+        raise SystemExit(f"Verifica a moltiplicatori unitari fallita: giorni uguali al CPM {same_days}, probabilità diverse su {int((probability != expected).sum())} termini")
+    print(f"  verifica moltiplicatori unitari: {valid.sum()} TUP/TUF, {int((expected == 100).sum())} rispettati (100%), {int((expected == 0).sum())} mancati (0%), "
+          f"{int((expected_days[valid] == deadline_days[valid]).sum())} alla data del file")
+
+
+def bench_file(path, label, iterations, workers_list):
+    project_data = loader.load_project(path); project_index = build_project_index(project_data)
+    check_unit_multipliers(project_data, project_index)
+    t0 = time.perf_counter(); model = build_risk_model(project_data, project_index); prepare = time.perf_counter() - t0
+    network = model['network']
+    print(f"{label}: {network['n_nodes']} nodi, {len(network['forward']['source'])} archi, {len(network['forward']['groups'])} livelli, modello {prepare:.3f} s")
+    for workers in workers_list:
+        t0 = time.perf_counter(); result = simulate_schedule_risk(model, iterations, seed=0, workers=workers); elapsed = time.perf_counter() - t0
+        p80 = project_finish_summary(model, result)[0].get(80)
+        print(f"  {iterations:>8} iterazioni {workers:>3} processi {elapsed:>8.2f} s   fine P80 {p80}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark della simulazione Monte Carlo dei rischi.")
+    parser.add_argument('sizes', nargs='*', type=int, help="attività dei file sintetici (default: 5000 20000)")
+    parser.add_argument('--file', nargs='*', default=[], help="baseline MSPDI reali")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--workers', nargs='*', type=int, default=sorted({1, RISK_WORKERS}))
+    args = parser.parse_args()
+    for path in args.file: bench_file(path, os.path.basename(path), args.iterations, args.workers)
+    if args.file and not args.sizes: sys.exit(0)
+    with tempfile.TemporaryDirectory(prefix='infratrack_bench_') as work_dir:
+        for n_tasks in args.sizes or [5000, 20000]:
+            path = os.path.join(work_dir, f"risk_{n_tasks}.xml"); generate_mspdi(path, n_tasks, timephased_density=0.0)
+            bench_file(path, f"sintetico {n_tasks}", args.iterations, args.workers)
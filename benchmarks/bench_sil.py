@@ -0,0 +1,36 @@
+# --- Benchmark: selezione attività SIL (get_tasks_to_distribute_for_sil) ---
+# Uso: python benchmarks/bench_sil.py [n_task ...]   (default: 10000 50000 200000)
+import os
+import sys
+import time
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from infratrack.sil import get_tasks_to_distribute_for_sil
+
+
+def synthetic_tasks(n_tasks, max_children=6, max_depth=5, seed=42):
+    # Albero WBS in ordine di struttura (padre prima dei figli), costi su ~80% delle attività
+    rnd = random.Random(seed); rows = []; stack = []; phase = 0
+    while len(rows) < n_tasks:
+        if not stack: phase += 1; stack.append((f"1.{phase}", 1))
+        wbs, level = stack.pop()
+        start = date(2024, 1, 1) + timedelta(days=rnd.randint(0, 1500))
+        rows.append({"UID": str(len(rows) + 1), "Name": f"Attività {wbs}", "Start": start, "Finish": start + timedelta(days=rnd.randint(0, 90)),
+                     "Duration": "1g", "Cost": rnd.choice([0.0, 1000.0, 2500.0, 10000.0, 50000.0]), "Milestone": False, "Summary": False,
+                     "WBS": wbs, "TotalSlackDays": 0})
+        if level < max_depth:
+            stack.extend((f"{wbs}.{i}", level + 1) for i in range(rnd.randint(1, max_children), 0, -1))
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 50000, 200000]
+    print(f"{'n_task':>10} {'selezionate':>12} {'secondi':>10}")
+    for n in sizes:
+        df = synthetic_tasks(n)
+        t0 = time.perf_counter(); result = get_tasks_to_distribute_for_sil(df); elapsed = time.perf_counter() - t0
+        print(f"{len(df):>10} {len(result):>12} {elapsed:>10.3f}")
@@ -0,0 +1,130 @@
+# --- Generatore deterministico di file MS Project XML (MSPDI) sintetici per i benchmark ---
+# Uso: python benchmarks/mspdi_generator.py OUTPUT.xml [n_attività] [--depth N] [--resources N] [--assignments R]
+#      [--timephased D] [--links L] [--seed S]
+# Stesso seed e stessi parametri = stesso file byte per byte. Struttura: riepilogo di progetto (UID 1), fasi
+# "1.n" e sotto-albero WBS fino a depth livelli; calendario Standard lun-ven 8h con festività e un calendario
+# a 6 giorni per parte delle risorse; PredecessorLink verso attività precedenti (rete aciclica); assegnazioni
+# con TimephasedData di lavoro pianificato (Type=1) ed effettivo (Type=2, ignorato dal loader ma da scandire).
+import argparse
+import random
+from datetime import datetime, timedelta
+
+MSP_NS = 'http://schemas.microsoft.com/project'
+BASE_DATE = datetime(2024, 1, 8, 8)
+_WORKING_TIMES = ('<WorkingTimes><WorkingTime><FromTime>08:00:00</FromTime><ToTime>12:00:00</ToTime></WorkingTime>'
+                  '<WorkingTime><FromTime>13:00:00</FromTime><ToTime>17:00:00</ToTime></WorkingTime></WorkingTimes>')
+# Nomi risorsa che coprono le tre classi (Mezzi, Manodopera, Altro) delle regole predefinite
+RESOURCE_NAMES = ['Escavatore cingolato', 'Operaio comune', 'Autogru 50t', 'Autocarro 4 assi', 'Geometra', 'Materiale vario',
+                  'Squadra armamento', 'Dumper', 'Calcestruzzo C30/37', 'Operaio specializzato', 'Pala gommata', 'Noli a caldo']
+
+
+def _date(value):
+    return f"{value:%Y-%m-%dT%H:%M:%S}"
+
+
+def _wbs_codes(rnd, n_tasks, depth, max_children):
+    # Codici WBS in ordine di struttura (padre prima dei figli), depth = livelli sotto la fase
+    codes = []; phase = 0
+    while len(codes) < n_tasks:
+        phase += 1; stack = [(f"1.{phase}", 1)]
+        while stack and len(codes) < n_tasks:
+            code, level = stack.pop(); codes.append(code)
+            if level <= depth: stack.extend((f"{code}.{i}", level + 1) for i in range(rnd.randint(2, max_children), 0, -1))
+    return codes
+
+
+def _calendars(write, horizon_days):
+    write('<Calendars>\n<Calendar><UID>1</UID><Name>Standard</Name><IsBaseCalendar>1</IsBaseCalendar><WeekDays>')
+    for day_type in range(1, 8):
+        if day_type in (1, 7): write(f'<WeekDay><DayType>{day_type}</DayType><DayWorking>0</DayWorking></WeekDay>')
+        else: write(f'<WeekDay><DayType>{day_type}</DayType><DayWorking>1</DayWorking>{_WORKING_TIMES}</WeekDay>')
+    write('</WeekDays><Exceptions>')
+    for year in range(BASE_DATE.year, (BASE_DATE + timedelta(days=horizon_days)).year + 2):
+        for month, day in ((1, 1), (4, 25), (5, 1), (6, 2), (8, 15), (12, 25), (12, 26)):
+            write(f'<Exception><Type>1</Type><TimePeriod><FromDate>{year}-{month:02d}-{day:02d}T00:00:00</FromDate>'
+                  f'<ToDate>{year}-{month:02d}-{day:02d}T23:59:00</ToDate></TimePeriod><DayWorking>0</DayWorking></Exception>')
+    write('</Exceptions></Calendar>\n')
+    # Calendario a 6 giorni derivato dallo Standard (sabato lavorativo)
+    write(f'<Calendar><UID>2</UID><Name>Turno 6 giorni</Name><IsBaseCalendar>1</IsBaseCalendar><BaseCalendarUID>1</BaseCalendarUID>'
+          f'<WeekDays><WeekDay><DayType>7</DayType><DayWorking>1</DayWorking>{_WORKING_TIMES}</WeekDay></WeekDays></Calendar>\n</Calendars>\n')
+
+
+def generate_mspdi(path, n_tasks=1000, depth=3, n_resources=50, assignment_ratio=0.5, timephased_density=1.0, links_per_task=1.0,
+                   seed=42, horizon_days=1500, max_duration_days=60, max_children=6):
+    # n_tasks: attività oltre al riepilogo di progetto; assignment_ratio: quota di attività foglia con un'assegnazione;
+    # timephased_density: quota di giorni dell'assegnazione con un record TimephasedData (1.0 = ogni giorno);
+    # links_per_task: media dei PredecessorLink per attività foglia. Restituisce un dict con i conteggi generati.
+    rnd = random.Random(seed)
+    codes = _wbs_codes(rnd, n_tasks, depth, max_children)
+    summaries = {code.rsplit('.', 1)[0] for code in codes}
+    counts = {'tasks': len(codes) + 1, 'summary_tasks': 1, 'links': 0, 'resources': n_resources, 'assignments': 0, 'timephased_records': 0}
+    with open(path, 'w', encoding='utf-8') as output:
+        write = output.write
+        write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Project xmlns="{MSP_NS}">\n<Name>Progetto Sintetico</Name>\n'
+              f'<CalendarUID>1</CalendarUID><MinutesPerDay>480</MinutesPerDay>\n')
+        _calendars(write, horizon_days)
+        write('<Tasks>\n')
+        project_finish = BASE_DATE + timedelta(days=horizon_days + max_duration_days)
+        write(f'<Task><UID>1</UID><ID>1</ID><Name>Progetto Sintetico</Name><WBS>1</WBS><Start>{_date(BASE_DATE)}</Start>'
+              f'<Finish>{_date(project_finish)}</Finish><Duration>PT{(project_finish - BASE_DATE).days * 8}H0M0S</Duration>'
+              f'<Milestone>0</Milestone><Summary>1</Summary><Cost>0</Cost></Task>\n')
+        leaves = []
+        for position, code in enumerate(codes):
+            uid = position + 2; is_summary = code in summaries; counts['summary_tasks'] += is_summary
+            start = BASE_DATE + timedelta(days=rnd.randint(0, horizon_days)); duration = 0 if rnd.random() < 0.03 else rnd.randint(1, max_duration_days)
+            finish = start + timedelta(days=duration, hours=9 if duration else 0)
+            name = f"Fase {code}" if code.count('.') == 1 else f"Attività {code}" + (f" TUP {position}" if rnd.random() < 0.01 else "")
+            write(f'<Task><UID>{uid}</UID><ID>{uid}</ID><Name>{name}</Name><WBS>{code}</WBS><Start>{_date(start)}</Start><Finish>{_date(finish)}</Finish>'
+                  f'<Duration>PT{duration * 8}H0M0S</Duration><Milestone>{int(duration == 0)}</Milestone><Summary>{int(is_summary)}</Summary>')
+            if rnd.random() < 0.9:
+                slack = rnd.choice([0, 0, 1, 3, 10, 40])
+                write(f'<EarlyFinish>{_date(finish)}</EarlyFinish><LateFinish>{_date(finish + timedelta(days=slack))}</LateFinish>')
+            write(f'<Cost>{rnd.randint(0, 10 ** 8) if not is_summary and rnd.random() < 0.8 else 0}</Cost>')
+            if not is_summary:
+                if rnd.random() < 0.1: write('<CalendarUID>2</CalendarUID>')
+                if leaves:
+                    for _ in range(min(int(rnd.expovariate(1.0 / links_per_task) + 0.5) if links_per_task > 0 else 0, len(leaves))):
+                        write(f'<PredecessorLink><PredecessorUID>{rnd.choice(leaves[-200:])[0]}</PredecessorUID><Type>{rnd.choice([1, 1, 1, 0, 2, 3])}</Type>'
+                              f'<LinkLag>{rnd.choice([0, 0, 4800, -2400])}</LinkLag><LagFormat>7</LagFormat></PredecessorLink>'); counts['links'] += 1
+                leaves.append((uid, start, finish))
+            write('</Task>\n')
+        write('</Tasks>\n<Resources>\n<Resource><UID>0</UID><ID>0</ID></Resource>\n')
+        for uid in range(1, n_resources + 1):
+            write(f'<Resource><UID>{uid}</UID><ID>{uid}</ID><Name>{rnd.choice(RESOURCE_NAMES)} {uid}</Name><Type>1</Type>'
+                  f'<CalendarUID>{2 if uid % 5 == 0 else 1}</CalendarUID></Resource>\n')
+        write('</Resources>\n<Assignments>\n')
+        for task_uid, start, finish in leaves:
+            if rnd.random() >= assignment_ratio: continue
+            counts['assignments'] += 1; assignment_uid = counts['assignments']
+            write(f'<Assignment><UID>{assignment_uid}</UID><TaskUID>{task_uid}</TaskUID><ResourceUID>{rnd.randint(1, n_resources)}</ResourceUID>')
+            day = start.replace(hour=8)
+            while day <= finish:
+                span_end = day + timedelta(days=rnd.choice([1, 1, 1, 3]))
+                if rnd.random() < timephased_density:
+                    write(f'<TimephasedData><Type>1</Type><UID>{assignment_uid}</UID><Start>{_date(day)}</Start><Finish>{_date(span_end)}</Finish>'
+                          f'<Unit>2</Unit><Value>PT{rnd.choice([8, 4, 16, 0])}H0M0S</Value></TimephasedData>'
+                          f'<TimephasedData><Type>2</Type><UID>{assignment_uid}</UID><Start>{_date(day)}</Start><Finish>{_date(span_end)}</Finish>'
+                          f'<Unit>2</Unit><Value>PT1H0M0S</Value></TimephasedData>'); counts['timephased_records'] += 2
+                day = span_end
+            write('</Assignment>\n')
+        write('</Assignments>\n</Project>\n')
+    return counts
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Genera un file MSPDI sintetico deterministico.")
+    parser.add_argument('output', help="File XML di destinazione.")
+    parser.add_argument('tasks', nargs='?', type=int, default=1000, help="Numero di attività (default 1000).")
+    parser.add_argument('--depth', type=int, default=3, help="Livelli WBS sotto le fasi (default 3).")
+    parser.add_argument('--resources', type=int, default=50, help="Numero di risorse (default 50).")
+    parser.add_argument('--assignments', type=float, default=0.5, help="Quota di attività foglia con assegnazione (default 0.5).")
+    parser.add_argument('--timephased', type=float, default=1.0, help="Quota di giorni con TimephasedData (default 1.0).")
+    parser.add_argument('--links', type=float, default=1.0, help="PredecessorLink medi per attività foglia (default 1.0).")
+    parser.add_argument('--seed', type=int, default=42)
+    return parser
+
+
+if __name__ == '__main__':
+    args = build_arg_parser().parse_args()
+    result = generate_mspdi(args.output, args.tasks, args.depth, args.resources, args.assignments, args.timephased, args.links, args.seed)
+    print(", ".join(f"{key}={value}" for key, value in result.items()))
@@ -0,0 +1,8 @@
+# --- InfraTrack: logica di analisi dei file MSPDI (indipendente da Streamlit) ---
+import pandas as pd
+
+__version__ = "22.6"
+
+# Le tabelle condivise tra le sessioni (infratrack.store) restano di sola lettura solo con il Copy-on-Write, sempre
+# attivo da pandas 3 (requirements.txt): con un pandas 2.x installato lo si attiva qui (da pandas 3 l'opzione è deprecata)
+if int(pd.__version__.split('.')[0]) < 3: pd.options.mode.copy_on_write = True
@@ -0,0 +1,184 @@
+# --- Analisi Avanzate (Curva S, Istogrammi Risorse, Percorso Critico) ---
+# Calcoli condivisi dall'app Streamlit e dalla riga di comando: nessuna dipendenza da widget o
+# st.session_state, solo DataFrame in ingresso e in uscita.
+import numpy as np
+import pandas as pd
+
+from .calendars import project_calendars, month_working_days
+from .intervals import build_interval_index, overlap_mask, build_value_index, at_most_mask
+from .sil import get_tasks_to_distribute_for_sil
+from .scurve import distribute_costs, daily_cost_series, monthly_cost_series
+from .timephased import build_work_matrix
+from .wbs import build_wbs_tree, summary_labels
+
+COL_SUMMARY_NAME = "Riepilogo WBS"
+COL_CUMULATIVE_COST = 'Costo Cumulato (€)'
+DETAIL_RESOURCE_TYPES = ['Mezzi', 'Altro']
+WORK_HOURS_DECIMALS = 2  # ore di lavoro mostrate negli istogrammi
+CRITICAL_COLUMNS = ['WBS', 'Name', 'Duration', 'Start', 'Finish', 'TotalSlackDays']
+# Fonte della flessibilità totale: esportata da MS Project (CPM dove manca) o calcolata dal CPM nativo
+SLACK_COLUMNS = {'MS Project': 'TotalSlackDays', 'CPM': 'CPMTotalSlackDays'}
+
+
+def format_euro(value):
+    return f"€ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+# --- Indice di Progetto ---
+def build_project_index(project_data):
+    # Strutture costruite una volta per progetto (project_data: dict di load_project o st.session_state):
+    # selezione SIL e distribuzione costi con somme prefisse, estremi Start/Finish ordinati delle attività
+    # non di riepilogo, ordine per flessibilità, matrice risorsa x giorno del lavoro timephased, albero WBS. Ogni cambio di
+    # "Data Inizio/Data Fine" diventa una ricerca binaria su questi array, senza copie né conversioni di date.
+    calendars, project_calendar_uid = project_calendars(project_data)
+    project_index = {'calendars': calendars, 'project_calendar_uid': project_calendar_uid, 'tasks_to_distribute': pd.DataFrame(),
+                     'cost_distribution': None, 'task_periods': None, 'slack': {}, 'work_matrix': None,
+                     'wbs_tree': None}
+    all_tasks_data = project_data.get('all_tasks_data')
+    project_index['wbs_tree'] = build_wbs_tree(project_data.get('wbs_name_map', {}), all_tasks_data['WBS'] if all_tasks_data is not None and 'WBS' in all_tasks_data else ())
+    if all_tasks_data is not None and not all_tasks_data.empty:
+        tasks_to_distribute = get_tasks_to_distribute_for_sil(all_tasks_data); project_index['tasks_to_distribute'] = tasks_to_distribute
+        if not tasks_to_distribute.empty: project_index['cost_distribution'] = distribute_costs(tasks_to_distribute, calendars, project_calendar_uid)
+        leaf_tasks = (all_tasks_data['Summary'] == False).to_numpy(dtype=bool)
+        project_index['task_periods'] = build_interval_index(all_tasks_data['Start'], all_tasks_data['Finish'], leaf_tasks)
+        project_index['slack'] = {column: build_value_index(all_tasks_data[column], leaf_tasks) for column in SLACK_COLUMNS.values() if column in all_tasks_data}
+    timephased_work_df = project_data.get('timephased_work_data')
+    if timephased_work_df is not None and not timephased_work_df.empty: project_index['work_matrix'] = build_work_matrix(timephased_work_df, project_data.get('resource_map', {}))
+    return project_index
+
+
+# --- Curva S ---
+def aggregate_cost_series(filtered_cost, aggregation_level, wbs_tree):
+    # filtered_cost: serie già limitata al periodo, mensile (Date = fine mese, Value) o giornaliera (Date, Value, WBS_List);
+    # wbs_tree: albero WBS (infratrack.wbs, sola lettura), etichette di riepilogo calcolate una volta per insieme di codici
+    if aggregation_level == 'Mensile':
+        aggregated_data = filtered_cost.copy()
+        aggregated_data['Periodo'] = aggregated_data['Date'].dt.strftime('%b-%y').str.capitalize()
+    else: # Giornaliera
+        aggregated_data = filtered_cost.copy()
+        aggregated_data[COL_SUMMARY_NAME] = summary_labels(wbs_tree, aggregated_data['WBS_List'])
+        aggregated_data['Periodo'] = aggregated_data['Date'].dt.strftime('%d/%m/%Y')
+    aggregated_data[COL_CUMULATIVE_COST] = aggregated_data['Value'].cumsum()
+    return aggregated_data
+
+
+def scurve_analysis(project_index, wbs_name_map, start_date, finish_date, aggregation_level):
+    # Restituisce (tasks_to_distribute, aggregated_data); aggregated_data è None se non c'è nulla da distribuire.
+    # Distribuzione già calcolata nell'indice: il periodo è una fetta (giornaliera) o differenze di somme prefisse (mensile)
+    tasks_to_distribute = project_index['tasks_to_distribute']; cost_distribution = project_index['cost_distribution']
+    if tasks_to_distribute.empty: return tasks_to_distribute, None
+    if cost_distribution is None or cost_distribution['origin'] is None: return tasks_to_distribute, None
+    if aggregation_level == 'Mensile': filtered_cost = monthly_cost_series(cost_distribution, start_date, finish_date)
+    else: filtered_cost = daily_cost_series(cost_distribution, start_date, finish_date, with_wbs=True)
+    if filtered_cost.empty: return tasks_to_distribute, filtered_cost
+    wbs_tree = project_index.get('wbs_tree') or build_wbs_tree(wbs_name_map)
+    return tasks_to_distribute, aggregate_cost_series(filtered_cost, aggregation_level, wbs_tree)
+
+
+def scurve_export_table(aggregated_data, aggregation_level):
+    df_export = aggregated_data.copy()
+    if aggregation_level == 'Mensile':
+        df_export['Date'] = df_export['Date'].dt.strftime('%b-%y').str.capitalize()
+        return df_export[['Date', 'Value', COL_CUMULATIVE_COST]].rename(columns={'Date': 'Mese', 'Value': 'Costo Mensile (€)'})
+    df_export['Date'] = df_export['Date'].dt.strftime('%d/%m/%Y')
+    return df_export[['Date', 'Value', COL_CUMULATIVE_COST, COL_SUMMARY_NAME]].rename(columns={'Date': 'Giorno', 'Value': 'Costo Giornaliero (€)', COL_SUMMARY_NAME: 'Riepilogo WBS'})
+
+
+# --- Istogrammi Risorse (unità medie giornaliere eq. 8h) ---
+def _average_daily_units(aggregated_hist, calendar):
+    # Media mensile sui giorni lavorativi del mese (calendario di progetto); giorni di calendario se il mese non ne ha
+    aggregated_hist['WorkingDaysInMonth'] = month_working_days(calendar, aggregated_hist['Date'].to_numpy(dtype='datetime64[D]'))
+    days = aggregated_hist['WorkingDaysInMonth'].where(aggregated_hist['WorkingDaysInMonth'] > 0, aggregated_hist['Date'].dt.daysinmonth)
+    aggregated_hist['AvgDailyUnits'] = (aggregated_hist['WorkHours'] / 8.0) / days
+    return aggregated_hist
+
+
+def _month_range_hours(hours, days):
+    # Ore mensili (Date = fine mese) per riga su tutti i mesi tra il primo e l'ultimo giorno della fetta, come il
+    # resample('ME'): per ogni riga restano i mesi tra il suo primo e il suo ultimo mese con lavoro (zeri intermedi inclusi)
+    months = days.astype('datetime64[M]')
+    month_firsts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    all_months = np.arange(months[0], months[-1] + 1)
+    month_hours = np.zeros((hours.shape[0], len(all_months)))
+    month_hours[:, (months[month_firsts] - months[0]).astype(np.int64)] = np.add.reduceat(hours, month_firsts, axis=1, dtype=np.float64)
+    has_work = month_hours > 0; columns = np.arange(len(all_months))
+    first = has_work.argmax(axis=1); last = len(all_months) - 1 - has_work[:, ::-1].argmax(axis=1)
+    keep = has_work.any(axis=1)[:, None] & (columns >= first[:, None]) & (columns <= last[:, None])
+    return month_hours, keep, (all_months + 1).astype('datetime64[D]') - np.timedelta64(1, 'D')
+
+
+def aggregate_resource_histogram(project_index, resource_type, start_date, finish_date, aggregation_level):
+    # Mezzi/Altro: dettaglio per risorsa; Manodopera: totale. DataFrame vuoto se non ci sono dati nel periodo.
+    # Fetta della matrice risorsa x giorno (righe del tipo, colonne del periodo per ricerca binaria) e riduzioni:
+    # nessun groupby/resample sul lavoro timephased. Medie mensili sul calendario di progetto.
+    calendar = project_index['calendars'][project_index['project_calendar_uid']]; work_matrix = project_index['work_matrix']
+    detail = resource_type in DETAIL_RESOURCE_TYPES
+    empty = pd.DataFrame(columns=['Date'] + (['ResourceName'] if detail else []) + ['WorkHours', 'AvgDailyUnits', 'Periodo', 'AvgDailyUnits_Rounded'])
+    if work_matrix is None or resource_type not in work_matrix['type_rows']: return empty
+    first_row, end_row = work_matrix['type_rows'][resource_type]; days = work_matrix['days']
+    first_day = np.searchsorted(days, np.datetime64(start_date, 'D'), side='left'); end_day = np.searchsorted(days, np.datetime64(finish_date, 'D'), side='right')
+    if end_day <= first_day: return empty
+    hours = work_matrix['hours'][first_row:end_row, first_day:end_day]; period_days = days[first_day:end_day]
+    if not detail: hours = hours.sum(axis=0, dtype=np.float64, keepdims=True)
+    if aggregation_level == 'Mensile': hours, keep, period_days = _month_range_hours(hours, period_days)
+    else: keep = hours > 0
+    # Trasposta: righe in ordine (Date, ResourceName), come il vecchio sort_values
+    day_index, row_index = np.nonzero(keep.T)
+    if len(day_index) == 0: return empty
+    aggregated_hist = pd.DataFrame({'Date': pd.to_datetime(period_days[day_index])})
+    if detail: aggregated_hist['ResourceName'] = work_matrix['resource_names'][first_row:end_row][row_index]
+    # Ore al centesimo: elimina i residui float32 della matrice e delle somme, così i casi esattamente a metà unità
+    # non cambiano arrotondamento
+    aggregated_hist['WorkHours'] = np.round(hours[row_index, day_index].astype(np.float64), WORK_HOURS_DECIMALS)
+    if aggregation_level == 'Mensile': aggregated_hist = _average_daily_units(aggregated_hist, calendar)
+    else: aggregated_hist['AvgDailyUnits'] = aggregated_hist['WorkHours'] / 8.0
+    # Etichette formattate una volta per colonna (giorno/mese) e non per riga
+    date_format_display = '%b-%y' if aggregation_level == 'Mensile' else '%d/%m/%Y'
+    aggregated_hist['Periodo'] = pd.DatetimeIndex(period_days).strftime(date_format_display).str.capitalize().to_numpy()[day_index]
+    aggregated_hist['AvgDailyUnits_Rounded'] = aggregated_hist['AvgDailyUnits'].round().astype(int)
+    return aggregated_hist
+
+
+def histogram_export_table(aggregated_hist, resource_type, aggregation_level):
+    axis_title = "Mese" if aggregation_level == 'Mensile' else "Giorno"; col_name = "Unità Media Giorn."
+    df_export = aggregated_hist.copy()
+    df_export['Date'] = df_export['Date'].dt.strftime('%b-%y').str.capitalize() if aggregation_level == 'Mensile' else df_export['Date'].dt.strftime('%d/%m/%Y')
+    if resource_type in DETAIL_RESOURCE_TYPES:
+        return df_export[['Date', 'ResourceName', 'AvgDailyUnits_Rounded']].rename(columns={'Date': axis_title, 'AvgDailyUnits_Rounded': col_name, 'ResourceName': 'Risorsa'})
+    return df_export[['Date', 'AvgDailyUnits_Rounded']].rename(columns={'Date': axis_title, 'AvgDailyUnits_Rounded': col_name})
+
+
+def histogram_display_pivot(aggregated_hist, value_column="Unità Media Giorn."):
+    # Tabella Periodo x Risorsa mostrata nell'app (Mezzi/Altro), periodi in ordine cronologico; solleva se il pivot non è possibile
+    df_display = aggregated_hist.rename(columns={'AvgDailyUnits_Rounded': value_column})
+    pivot_table = pd.pivot_table(df_display, values=value_column, index='Periodo', columns='ResourceName', aggfunc='first', fill_value=0)
+    return pivot_table.reindex(aggregated_hist['Periodo'].unique())
+
+
+def histogram_pivot_table(df_export_table, aggregation_level):
+    # Pivot Periodo x Risorsa (export mensile Mezzi/Altro), ordinamento cronologico preservato
+    axis_title = "Mese" if aggregation_level == 'Mensile' else "Giorno"
+    try:
+        df_pivot = pd.pivot_table(df_export_table, values="Unità Media Giorn.", index=axis_title, columns='Risorsa', fill_value=0)
+        return df_pivot.reindex(df_export_table[axis_title].unique())
+    except Exception: return None
+
+
+# --- Percorso Critico ---
+def filter_critical_tasks(project_index, all_tasks_df, slack_threshold, start_date, finish_date, slack_column='TotalSlackDays'):
+    # Restituisce (attività critiche nel periodo, attività critiche prima del filtro sul periodo).
+    # Soglia di flessibilità e sovrapposizione al periodo (Start <= fine, Finish >= inizio) sono ricerche binarie
+    # sugli indici di progetto (solo attività non di riepilogo); solo le righe selezionate vengono estratte.
+    if project_index['task_periods'] is None or slack_column not in project_index['slack']: return all_tasks_df.iloc[0:0], all_tasks_df.iloc[0:0]
+    critical = at_most_mask(project_index['slack'][slack_column], slack_threshold)
+    in_period = critical & overlap_mask(project_index['task_periods'], start_date, finish_date)
+    return all_tasks_df.iloc[np.flatnonzero(in_period)], all_tasks_df.iloc[np.flatnonzero(critical)]
+
+
+def critical_display_table(critical_tasks_in_period, slack_column='TotalSlackDays'):
+    # Ordinata per data di inizio, date formattate gg/mm/aaaa; con il CPM anche la flessibilità libera
+    df_display_crit = critical_tasks_in_period.sort_values(by='Start')
+    df_display_crit = df_display_crit.assign(Start=df_display_crit['Start'].dt.strftime('%d/%m/%Y').fillna('N/D'),
+                                             Finish=df_display_crit['Finish'].dt.strftime('%d/%m/%Y').fillna('N/D'))
+    columns = CRITICAL_COLUMNS[:-1] + [slack_column] + (['CPMFreeSlackDays'] if slack_column != 'TotalSlackDays' else ['SlackSource'])
+    return df_display_crit[[column for column in columns if column in df_display_crit.columns]]
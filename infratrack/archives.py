@@ -0,0 +1,86 @@
+# --- Baseline Compresse e Archivi (.xml.gz, .xml.zst, .zip) ---
+# Il formato è riconosciuto dai primi byte (non dall'estensione) e il documento XML viene decompresso a flusso
+# direttamente nel parser: nessun buffer con l'XML espanso, né in memoria né su disco. Da un .zip si legge un
+# membro XML alla volta (scelto dall'utente se sono più di uno). Il flusso compresso resta accessibile per
+# misurare l'avanzamento in byte caricati (la dimensione totale nota è quella del file compresso).
+import gzip
+import importlib.util
+import os
+import re
+import zipfile
+from contextlib import contextmanager
+
+UPLOAD_TYPES = ['xml', 'gz', 'zst', 'zip']  # estensioni accettate dall'uploader (".xml.gz" -> "gz")
+ARCHIVE_PATTERNS = ('*.xml', '*.XML', '*.xml.gz', '*.xml.zst', '*.zip')
+_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'\x28\xb5\x2f\xfd', 'zstd'), (b'PK\x03\x04', 'zip'))
+_COMPRESSED_SUFFIX = re.compile(r'(?i)(\.xml)?\.(gz|zst|zip)$|\.xml$')
+_zstandard_available = importlib.util.find_spec('zstandard') is not None
+
+
+def _open_raw(source):
+    # (handle, da_chiudere): i percorsi sono aperti qui, i file-like (UploadedFile) riportati all'inizio
+    if isinstance(source, (str, os.PathLike)): return open(source, 'rb'), True
+    source.seek(0)
+    return source, False
+
+
+def _detect(handle):
+    head = handle.read(4); handle.seek(0)
+    return next((name for magic, name in _MAGIC if head.startswith(magic)), 'xml')
+
+
+def _zstd_stream(raw):
+    if _zstandard_available:
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False)
+    try: from compression import zstd  # Python >= 3.14
+    except ImportError: raise ValueError("File .zst non supportati: installare il pacchetto 'zstandard'.")
+    return zstd.ZstdFile(raw)
+
+
+def _xml_names(archive):
+    return [info.filename for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.xml') and not info.filename.startswith('__MACOSX/')]
+
+
+def xml_members(source):
+    # Membri XML di un .zip (in ordine di archivio); None se source non è un archivio zip
+    raw, owned = _open_raw(source)
+    try:
+        if _detect(raw) != 'zip': return None
+        with zipfile.ZipFile(raw) as archive: return _xml_names(archive)
+    finally:
+        if owned: raw.close()
+        else: raw.seek(0)
+
+
+@contextmanager
+def open_xml(source, member=None):
+    # Restituisce (flusso XML decompresso, flusso grezzo del file); member: membro di un .zip (obbligatorio se ne
+    # contiene più di uno)
+    raw, owned = _open_raw(source)
+    try:
+        kind = _detect(raw)
+        if kind == 'gzip':
+            with gzip.GzipFile(fileobj=raw, mode='rb') as stream: yield stream, raw
+        elif kind == 'zstd':
+            stream = _zstd_stream(raw)
+            try: yield stream, raw
+            finally: stream.close()
+        elif kind == 'zip':
+            with zipfile.ZipFile(raw) as archive:
+                names = _xml_names(archive)
+                if member is None:
+                    if len(names) != 1: raise ValueError(f"L'archivio contiene {len(names)} file XML: indicare quale analizzare ({', '.join(names) or 'nessuno'}).")
+                    member = names[0]
+                elif member not in names: raise ValueError(f"'{member}' non è un file XML dell'archivio.")
+                with archive.open(member) as stream: yield stream, raw
+        else: yield raw, raw
+    finally:
+        if owned: raw.close()
+
+
+def project_stem(name, member=None):
+    # Nome base per report e etichette: "lotto1.xml.gz" -> "lotto1"; per un membro di .zip il nome del membro
+    base = os.path.basename(member or name)
+    return _COMPRESSED_SUFFIX.sub('', base) or base
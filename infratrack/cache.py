@@ -0,0 +1,146 @@
+# --- Cache Progetti su Disco (chiave = SHA-256 del file + versione del parser) ---
+# Le tabelle normalizzate (attività, risorse, timephased, TUP/TUF) sono salvate in Parquet, i valori
+# scalari in meta.json. Riaprire la stessa baseline salta completamente il parsing XML.
+# Eviction LRU per dimensione: l'mtime della cartella viene aggiornato a ogni lettura.
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+
+import pandas as pd
+
+from .loader import load_project, PARSER_VERSION
+from .schema import TABLE_DTYPES, compact_table
+from .profiling import stage
+from .progress import report
+
+# Motore Parquet: presenza verificata senza importarlo qui (lo carica pandas quando serve)
+_parquet_available = importlib.util.find_spec('pyarrow') is not None
+
+CACHE_DIR = os.environ.get('INFRATRACK_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'infratrack'))
+CACHE_MAX_BYTES = int(float(os.environ.get('INFRATRACK_CACHE_MAX_MB', '2048')) * 1024 * 1024)
+_CHUNK_SIZE = 1024 * 1024
+_META_FILE = 'meta.json'
+
+
+def file_digest(source, member=None):
+    # SHA-256 a blocchi (nessuna copia completa del file in memoria) del file caricato, così com'è (anche
+    # compresso); per un membro di un .zip il nome del membro entra nell'impronta
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''): digest.update(chunk)
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(_CHUNK_SIZE), b''): digest.update(chunk)
+        source.seek(0)
+    if member is not None: digest.update(b'\0' + member.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_key(digest):
+    return f"{digest}-p{PARSER_VERSION}"
+
+
+def _entry_dir(key, cache_dir):
+    return os.path.join(cache_dir or CACHE_DIR, key)
+
+
+def _encode_value(value):
+    if isinstance(value, date): return {'__date__': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and '__date__' in value: return date.fromisoformat(value['__date__'])
+    return value
+
+
+def load_cached_project(key, cache_dir=None):
+    entry = _entry_dir(key, cache_dir)
+    meta_path = os.path.join(entry, _META_FILE)
+    if not _parquet_available or not os.path.exists(meta_path): return None
+    try:
+        with open(meta_path, encoding='utf-8') as f: meta = json.load(f)
+        project_data = {name: _decode_value(value) for name, value in meta['values'].items()}
+        for name in meta['tables']: project_data[name] = compact_table(pd.read_parquet(os.path.join(entry, f"{name}.parquet")), TABLE_DTYPES.get(name, {}))
+        for name in meta['empty_tables']: project_data[name] = None
+        os.utime(entry)  # LRU: ultimo accesso
+        return project_data
+    except Exception as e:
+        print(f"WARNING: Voce di cache illeggibile ({key}): {e}")
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+
+def store_cached_project(key, project_data, cache_dir=None):
+    if not _parquet_available: return False
+    cache_root = cache_dir or CACHE_DIR
+    os.makedirs(cache_root, exist_ok=True)
+    tmp_entry = tempfile.mkdtemp(prefix='.tmp-', dir=cache_root)
+    try:
+        meta = {'values': {}, 'tables': [], 'empty_tables': []}
+        for name, value in project_data.items():
+            if isinstance(value, pd.DataFrame):
+                value.to_parquet(os.path.join(tmp_entry, f"{name}.parquet"), index=False); meta['tables'].append(name)
+            elif value is None and name.startswith('df_'): meta['empty_tables'].append(name)
+            else: meta['values'][name] = _encode_value(value)
+        with open(os.path.join(tmp_entry, _META_FILE), 'w', encoding='utf-8') as f: json.dump(meta, f, ensure_ascii=False)
+        entry = _entry_dir(key, cache_root)
+        if os.path.exists(entry): shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_entry, entry)
+    except Exception as e:
+        print(f"WARNING: Impossibile salvare il progetto in cache ({key}): {e}")
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        return False
+    evict_cache(cache_root)
+    return True
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def evict_cache(cache_dir=None, max_bytes=None):
+    # Elimina le voci meno usate di recente finché la cache non rientra nel limite
+    cache_root = cache_dir or CACHE_DIR; max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(cache_root): return
+    entries = [os.path.join(cache_root, name) for name in os.listdir(cache_root) if not name.startswith('.')]
+    entries = sorted((os.path.getmtime(path), _dir_size(path), path) for path in entries if os.path.isdir(path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes: break
+        shutil.rmtree(path, ignore_errors=True); total -= size
+
+
+def clear_project_cache(cache_dir=None):
+    cache_root = cache_dir or CACHE_DIR
+    if os.path.isdir(cache_root): shutil.rmtree(cache_root, ignore_errors=True)
+
+
+def remove_cached_project(key, cache_dir=None):
+    # Invalida una sola baseline (le altre voci restano)
+    entry = _entry_dir(key, cache_dir)
+    if os.path.isdir(entry): shutil.rmtree(entry, ignore_errors=True)
+
+
+def load_project_for_key(source, key, cache_dir=None, profile=None, progress=None, member=None):
+    # Restituisce (project_data, da_cache) per una chiave già calcolata con cache_key(file_digest(source, member));
+    # progress: infratrack.progress (un caricamento annullato non scrive la cache)
+    report(progress, "Lettura cache su disco")
+    with stage(profile, "Lettura cache su disco", 'io'): project_data = load_cached_project(key, cache_dir)
+    if project_data is not None: return project_data, True
+    with stage(profile, "Parsing MSPDI", 'parse'): project_data = load_project(source, profile, progress, member)
+    report(progress, "Scrittura cache su disco")
+    with stage(profile, "Scrittura cache su disco", 'io'): store_cached_project(key, project_data, cache_dir)
+    return project_data, False
+
+
+def load_project_cached(source, cache_dir=None, profile=None, member=None):
+    # Restituisce (project_data, digest, da_cache); profile: infratrack.profiling (tempi per fase)
+    with stage(profile, "Lettura upload (SHA-256)", 'io'): digest = file_digest(source, member)
+    project_data, from_cache = load_project_for_key(source, cache_key(digest), cache_dir, profile, member=member)
+    return project_data, digest, from_cache
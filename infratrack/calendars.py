@@ -0,0 +1,177 @@
+# --- Calendari di Lavoro MSPDI compilati (maschera giorni lavorativi + minuti per giorno) ---
+# Ogni <Calendar> diventa una definizione serializzabile (minuti per giorno della settimana + eccezioni,
+# ereditarietà da BaseCalendarUID già risolta), salvata con il progetto anche nella cache su disco.
+# compile_calendar la trasforma in array NumPy e in un np.busdaycalendar: conteggi e maschere dei giorni
+# lavorativi sono interrogazioni vettoriali, senza cicli Python giorno per giorno.
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+MSP_NS = 'http://schemas.microsoft.com/project'
+NS = {'msp': MSP_NS}
+STANDARD_CALENDAR_UID = '1'
+DEFAULT_DAY_MINUTES = 480.0  # giorno lavorativo senza WorkingTimes esplicite (08-12, 13-17)
+# Lunedì..Domenica (ordine NumPy); in MSPDI DayType 1 = Domenica ... 7 = Sabato, 0 = eccezione
+DEFAULT_WEEK_MINUTES = [DEFAULT_DAY_MINUTES] * 5 + [0.0, 0.0]
+_MAX_EXCEPTION_DAYS = 3660  # intervalli più lunghi (ricorrenze esportate come periodo) vengono ignorati
+
+
+def _weekdays(days):
+    # 0 = Lunedì (1970-01-01 era un giovedì)
+    return (days.astype('datetime64[D]').astype(np.int64) + 3) % 7
+
+
+def _as_days(values):
+    return np.asarray(values, dtype='datetime64[D]')
+
+
+def _weekday_index(day_type):
+    return (int(day_type) + 5) % 7
+
+
+def _working_minutes(parent_elem, day_working, ns=NS):
+    if day_working != '1': return 0.0
+    total = 0.0; found = False
+    for working_time in parent_elem.findall(".//msp:WorkingTime", namespaces=ns):
+        from_time_str = working_time.findtext('msp:FromTime', namespaces=ns); to_time_str = working_time.findtext('msp:ToTime', namespaces=ns)
+        if not from_time_str or not to_time_str: continue
+        try:
+            from_time = datetime.strptime(from_time_str, '%H:%M:%S'); to_time = datetime.strptime(to_time_str, '%H:%M:%S')
+        except ValueError: continue
+        delta = to_time - from_time
+        if delta <= timedelta(0): delta += timedelta(days=1)  # ToTime 00:00:00 = mezzanotte
+        total += delta.total_seconds() / 60; found = True
+    return total if found else DEFAULT_DAY_MINUTES
+
+
+def _exception_days(from_date_str, to_date_str):
+    try:
+        first = datetime.fromisoformat(from_date_str).date(); last = datetime.fromisoformat(to_date_str).date()
+    except (TypeError, ValueError): return None
+    if last < first or (last - first).days > _MAX_EXCEPTION_DAYS: return None
+    return first.isoformat(), last.isoformat()
+
+
+def parse_calendar(calendar_elem, ns=NS):
+    # Definizione non ancora risolta: WeekMinutes contiene None per i giorni ereditati dal calendario base
+    uid = calendar_elem.findtext('msp:UID', namespaces=ns)
+    base_uid = calendar_elem.findtext('msp:BaseCalendarUID', namespaces=ns)
+    week_minutes = [None] * 7; exceptions = []
+    for week_day in calendar_elem.iterfind('msp:WeekDays/msp:WeekDay', namespaces=ns):
+        day_type = week_day.findtext('msp:DayType', namespaces=ns); day_working = week_day.findtext('msp:DayWorking', namespaces=ns)
+        if not day_type or not day_type.isdigit(): continue
+        minutes = _working_minutes(week_day, day_working, ns)
+        if day_type == '0':  # eccezioni in formato MSPDI 2003
+            days = _exception_days(week_day.findtext('msp:TimePeriod/msp:FromDate', namespaces=ns), week_day.findtext('msp:TimePeriod/msp:ToDate', namespaces=ns))
+            if days: exceptions.append([days[0], days[1], minutes])
+        elif 1 <= int(day_type) <= 7: week_minutes[_weekday_index(day_type)] = minutes
+    for exception in calendar_elem.iterfind('msp:Exceptions/msp:Exception', namespaces=ns):
+        # Solo eccezioni giornaliere non ricorrenti (Type 1, periodo 1): le ricorrenze annuali/mensili
+        # sono esportate con l'intero intervallo di validità e non vanno espanse giorno per giorno
+        if exception.findtext('msp:Type', namespaces=ns) not in (None, '1') or exception.findtext('msp:Period', namespaces=ns) not in (None, '1'): continue
+        days = _exception_days(exception.findtext('msp:TimePeriod/msp:FromDate', namespaces=ns), exception.findtext('msp:TimePeriod/msp:ToDate', namespaces=ns))
+        if days: exceptions.append([days[0], days[1], _working_minutes(exception, exception.findtext('msp:DayWorking', namespaces=ns), ns)])
+    return {'UID': uid, 'Name': calendar_elem.findtext('msp:Name', namespaces=ns) or f"Calendario UID {uid}",
+            'BaseUID': base_uid if base_uid not in (None, '', '-1') else None, 'WeekMinutes': week_minutes, 'Exceptions': exceptions}
+
+
+def resolve_calendars(calendar_specs):
+    # Risolve l'ereditarietà (giorni della settimana ed eccezioni del calendario base, quelle proprie hanno
+    # la precedenza). Restituisce {UID: definizione completa} con soli valori JSON.
+    resolved = {}
+
+    def resolve(uid, visiting):
+        if uid in resolved: return resolved[uid]
+        spec = calendar_specs[uid]; base = None
+        if spec['BaseUID'] in calendar_specs and spec['BaseUID'] not in visiting: base = resolve(spec['BaseUID'], visiting | {uid})
+        base_week = base['WeekMinutes'] if base else DEFAULT_WEEK_MINUTES
+        week_minutes = [float(own if own is not None else inherited) for own, inherited in zip(spec['WeekMinutes'], base_week)]
+        exceptions = (base['Exceptions'] if base else []) + spec['Exceptions']
+        resolved[uid] = {'UID': uid, 'Name': spec['Name'], 'WeekMinutes': week_minutes, 'Exceptions': exceptions}
+        return resolved[uid]
+
+    for uid in calendar_specs: resolve(uid, frozenset())
+    return resolved
+
+
+def default_calendar_spec():
+    return {'UID': STANDARD_CALENDAR_UID, 'Name': 'Standard', 'WeekMinutes': list(DEFAULT_WEEK_MINUTES), 'Exceptions': []}
+
+
+def compile_calendar(spec):
+    week_minutes = np.asarray(spec['WeekMinutes'], dtype=np.float64); weekmask = week_minutes > 0
+    # Eccezioni espanse per giorno; a parità di giorno vale l'ultima (calendario derivato dopo il base)
+    exception_minutes = {}
+    for from_date, to_date, minutes in spec['Exceptions']:
+        first = np.datetime64(from_date, 'D'); n_days = int((np.datetime64(to_date, 'D') - first).astype(np.int64)) + 1
+        for day in first + np.arange(n_days): exception_minutes[day] = float(minutes)
+    exception_days = np.array(sorted(exception_minutes), dtype='datetime64[D]')
+    exception_values = np.array([exception_minutes[day] for day in exception_days], dtype=np.float64)
+    holidays = exception_days[exception_values == 0]
+    # Giorni lavorativi "extra" (es. sabato lavorato): np.busdaycalendar gestisce solo le festività
+    extra_days = exception_days[(exception_values > 0) & ~weekmask[_weekdays(exception_days)]]
+    working_week = week_minutes[weekmask]
+    return {'UID': spec['UID'], 'Name': spec['Name'], 'weekmask': weekmask, 'week_minutes': week_minutes,
+            'busdaycal': np.busdaycalendar(weekmask=weekmask, holidays=holidays) if weekmask.any() else None,
+            'exception_days': exception_days, 'exception_minutes': exception_values, 'extra_days': extra_days,
+            'minutes_per_day': float(np.median(working_week)) if len(working_week) else DEFAULT_DAY_MINUTES}
+
+
+def compile_calendars(calendar_specs):
+    return {uid: compile_calendar(spec) for uid, spec in (calendar_specs or {}).items()}
+
+
+def is_working_day(calendar, days):
+    days = _as_days(days)
+    working = np.is_busday(days, busdaycal=calendar['busdaycal']) if calendar['busdaycal'] is not None else np.zeros(days.shape, dtype=bool)
+    if len(calendar['extra_days']): working |= np.isin(days, calendar['extra_days'])
+    return working
+
+
+def working_minutes(calendar, days):
+    days = _as_days(days)
+    minutes = calendar['week_minutes'][_weekdays(days)]
+    exception_days = calendar['exception_days']
+    if len(exception_days):
+        position = np.clip(np.searchsorted(exception_days, days), 0, len(exception_days) - 1)
+        is_exception = exception_days[position] == days
+        minutes = np.where(is_exception, calendar['exception_minutes'][position], minutes)
+    return minutes
+
+
+def count_working_days(calendar, first_days, last_days):
+    # Giorni lavorativi in [first, last] (estremi inclusi), vettoriale
+    first_days = _as_days(first_days); end_days = _as_days(last_days) + np.timedelta64(1, 'D')
+    counts = np.busday_count(first_days, end_days, busdaycal=calendar['busdaycal']) if calendar['busdaycal'] is not None else np.zeros(np.broadcast(first_days, end_days).shape, dtype=np.int64)
+    extra_days = calendar['extra_days']
+    if len(extra_days): counts = counts + np.maximum(np.searchsorted(extra_days, end_days) - np.searchsorted(extra_days, first_days), 0)
+    return np.maximum(counts, 0)
+
+
+def compile_project_calendars(calendar_specs, project_calendar_uid=None):
+    # (calendari compilati per UID, UID del calendario di progetto); Standard lun-ven 8h se il file non ne contiene
+    calendars = compile_calendars(calendar_specs)
+    project_calendar_uid = project_calendar_uid or STANDARD_CALENDAR_UID
+    if project_calendar_uid not in calendars: calendars[project_calendar_uid] = compile_calendar(default_calendar_spec())
+    return calendars, project_calendar_uid
+
+
+def project_calendars(project_data):
+    # project_data: dict di load_project o st.session_state
+    return compile_project_calendars(project_data.get('calendars'), project_data.get('project_calendar_uid'))
+
+
+def calendar_codes(calendar_uids, calendars, default_uid):
+    # Codice calendario per riga (attività/risorsa) + calendari compilati corrispondenti;
+    # UID -1, vuoto o sconosciuto -> calendario del progetto
+    uids = pd.Series(calendar_uids, dtype=object)
+    codes, uniques = pd.factorize(uids.where(uids.isin(list(calendars)), default_uid))
+    return codes, [calendars[uid] for uid in uniques]
+
+
+def month_working_days(calendar, month_ends):
+    # Giorni lavorativi dei mesi che terminano in month_ends (Timestamp fine mese)
+    month_ends = _as_days(month_ends)
+    month_starts = month_ends.astype('datetime64[M]').astype('datetime64[D]')
+    return count_working_days(calendar, month_starts, month_ends)
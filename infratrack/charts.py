@@ -0,0 +1,96 @@
+# --- Rendering Immagini dei Grafici per gli Export Excel (Kaleido in background) ---
+# Un solo thread worker serializza le chiamate a Kaleido (il processo di rendering resta avviato tra un
+# export e l'altro) mentre lo script Streamlit continua a mostrare tabelle e grafici. I PNG sono tenuti
+# in una cache LRU di processo con chiave = SHA-256 della specifica del grafico + parametri di rendering:
+# riesportare la stessa analisi (stesso periodo, stessa aggregazione) non rilancia Kaleido.
+import hashlib
+import importlib.util
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+CHART_WIDTH = 900; CHART_HEIGHT = 500; CHART_SCALE = 1.5
+RENDER_TIMEOUT_SECONDS = 120
+_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='infratrack-charts')
+_lock = threading.Lock()
+_cache = OrderedDict(); _cache_bytes = 0
+_pending = {}
+_warm_up_future = None
+
+
+def renderer_available():
+    # Plotly, Kaleido e openpyxl installati (verifica senza importarli: restano da caricare al primo export)
+    return all(importlib.util.find_spec(module) is not None for module in ('plotly', 'kaleido', 'openpyxl'))
+
+
+def figure_spec(fig):
+    # Specifica JSON (dict) del grafico: copia indipendente dall'oggetto Figure, sicura da passare al thread
+    return fig.to_plotly_json() if hasattr(fig, 'to_plotly_json') else fig
+
+
+def figure_key(spec, image_format='png', width=CHART_WIDTH, height=CHART_HEIGHT, scale=CHART_SCALE):
+    from plotly.utils import PlotlyJSONEncoder
+    payload = json.dumps(spec, cls=PlotlyJSONEncoder, sort_keys=True)
+    return hashlib.sha256(f"{image_format}|{width}|{height}|{scale}|{payload}".encode('utf-8')).hexdigest()
+
+
+def _store(key, image_bytes):
+    global _cache_bytes
+    with _lock:
+        _pending.pop(key, None)
+        if key in _cache: return
+        _cache[key] = image_bytes; _cache_bytes += len(image_bytes)
+        while _cache_bytes > _CACHE_MAX_BYTES and len(_cache) > 1:
+            _, evicted = _cache.popitem(last=False); _cache_bytes -= len(evicted)
+
+
+def _render(key, spec, image_format, width, height, scale):
+    import plotly.io as pio
+    try: image_bytes = pio.to_image(spec, format=image_format, width=width, height=height, scale=scale)
+    except Exception:
+        with _lock: _pending.pop(key, None)
+        raise
+    _store(key, image_bytes)
+    return image_bytes
+
+
+def render_async(fig, image_format='png', width=CHART_WIDTH, height=CHART_HEIGHT, scale=CHART_SCALE):
+    # Future con i byte dell'immagine: già completato se il grafico è in cache, condiviso se è in coda
+    spec = figure_spec(fig); key = figure_key(spec, image_format, width, height, scale)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key); future = Future(); future.set_result(_cache[key])
+            return future
+        if key in _pending: return _pending[key]
+        future = _pending[key] = _executor.submit(_render, key, spec, image_format, width, height, scale)
+    return future
+
+
+def render_image(fig, image_format='png', width=CHART_WIDTH, height=CHART_HEIGHT, scale=CHART_SCALE, timeout=RENDER_TIMEOUT_SECONDS):
+    return render_async(fig, image_format, width, height, scale).result(timeout=timeout)
+
+
+def _warm_up():
+    # Kaleido >= 1.0 espone un server persistente; le versioni 0.x avviano il processo al primo rendering
+    try:
+        import kaleido
+        if hasattr(kaleido, 'start_sync_server'): kaleido.start_sync_server(silence_warnings=True); return
+    except Exception: pass
+    import plotly.io as pio
+    pio.to_image({'data': [], 'layout': {}}, format='png', width=10, height=10)
+
+
+def warm_up_renderer():
+    # Avvia Kaleido una sola volta per processo sul thread di rendering, senza bloccare lo script
+    global _warm_up_future
+    with _lock:
+        if _warm_up_future is None: _warm_up_future = _executor.submit(_warm_up)
+    return _warm_up_future
+
+
+def clear_chart_cache():
+    global _cache_bytes
+    with _lock: _cache.clear(); _cache_bytes = 0
@@ -0,0 +1,131 @@
+# --- Riga di Comando: report Excel in batch (python -m infratrack) ---
+# Stessa estrazione (cache su disco inclusa) e stesse analisi dell'app Streamlit. Ogni file XML (anche .xml.gz,
+# .xml.zst o ogni XML di un .zip) è elaborato in un processo separato (ProcessPoolExecutor): un progetto per core,
+# nessuno stato condiviso.
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import pandas as pd
+
+from . import __version__
+from .analysis import SLACK_COLUMNS
+from .archives import ARCHIVE_PATTERNS, xml_members, project_stem
+from .cache import load_project_cached
+from .loader import load_project
+from .locale_it import ensure_italian_locale
+from .report import build_project_report
+from .resources import load_rule_profile, compile_classifier, apply_resource_profile
+
+AGGREGATION_LEVELS = ['Mensile', 'Giornaliera']
+SUMMARY_COLUMNS = ['File', 'Progetto', 'Esito', 'Secondi', 'Da Cache', 'Report', 'Errore']
+
+
+def find_project_files(inputs):
+    # Accetta cartelle (tutti gli .xml, .xml.gz, .xml.zst e .zip contenuti), glob e percorsi di file; ordine stabile, senza duplicati
+    files = []
+    for item in inputs:
+        if os.path.isdir(item): matches = [path for pattern in ARCHIVE_PATTERNS for path in glob.glob(os.path.join(item, pattern))]
+        else: matches = glob.glob(item, recursive=True) or ([item] if os.path.isfile(item) else [])
+        files.extend(os.path.abspath(path) for path in matches)
+    return sorted(dict.fromkeys(files))
+
+
+def expand_archives(files):
+    # (percorso, membro): un progetto per file, e uno per ogni XML dei .zip che ne contengono più di uno
+    projects = []
+    for path in files:
+        try: members = xml_members(path)
+        except Exception: members = None  # archivio illeggibile: l'errore emerge nell'elaborazione del file
+        if members and len(members) > 1: projects.extend((path, member) for member in members)
+        else: projects.append((path, None))
+    return projects
+
+
+def project_label(path, member=None):
+    return path if member is None else f"{path}:{member}"
+
+
+def _report_filename(path, member=None):
+    # Membri di un .zip: nome dell'archivio + nome del membro (due archivi possono contenere lo stesso nome)
+    stem = project_stem(path) if member is None else f"{project_stem(path)}_{project_stem(path, member)}"
+    return f"{stem}_InfraTrack.xlsx"
+
+
+def process_project_file(path, output_dir, start_date, finish_date, aggregation_level, slack_threshold, use_cache=True, slack_column='TotalSlackDays', rules_profile=None, member=None):
+    # Eseguita nei processi worker: non solleva mai, restituisce una riga del riepilogo.
+    # rules_profile: profilo regole risorse (dict) compilato nel worker, la memoizzazione resta locale al processo
+    ensure_italian_locale()  # mesi in italiano nei fogli mensili, come nell'app (una volta per processo worker)
+    started = time.perf_counter(); row = {'File': project_label(path, member), 'Progetto': None, 'Esito': 'OK', 'Secondi': None, 'Da Cache': False, 'Report': None, 'Errore': None}
+    try:
+        if use_cache: project_data, _, row['Da Cache'] = load_project_cached(path, member=member)
+        else: project_data = load_project(path, member=member)
+        if rules_profile is not None: project_data.update(apply_resource_profile(project_data, compile_classifier(rules_profile)))
+        row['Progetto'] = project_data.get('project_name')
+        period_start = start_date or project_data.get('project_start_date'); period_finish = finish_date or project_data.get('project_finish_date')
+        output_path = os.path.join(output_dir, _report_filename(path, member))
+        build_project_report(project_data, output_path, period_start, period_finish, aggregation_level, slack_threshold, slack_column)
+        row['Report'] = output_path
+    except Exception as e:
+        row['Esito'] = 'ERRORE'; row['Errore'] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    row['Secondi'] = round(time.perf_counter() - started, 3)
+    return row
+
+
+def write_run_summary(rows, output_dir):
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    summary.to_csv(os.path.join(output_dir, 'riepilogo_esecuzione.csv'), index=False, encoding='utf-8-sig')
+    with open(os.path.join(output_dir, 'riepilogo_esecuzione.json'), 'w', encoding='utf-8') as f: json.dump(rows, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def _parse_date(value):
+    try: return date.fromisoformat(value)
+    except ValueError: raise argparse.ArgumentTypeError(f"data non valida '{value}' (formato AAAA-MM-GG)")
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog='python -m infratrack', description="Report Excel InfraTrack (Curva S, istogrammi risorse, TUP/TUF, attività critiche) per più progetti MS Project XML.")
+    parser.add_argument('inputs', nargs='+', help="File .xml (.xml.gz, .xml.zst, .zip), cartelle o glob (es. 'progetti/*.xml')")
+    parser.add_argument('--start', type=_parse_date, default=None, help="Inizio periodo AAAA-MM-GG (default: inizio progetto)")
+    parser.add_argument('--end', type=_parse_date, default=None, help="Fine periodo AAAA-MM-GG (default: fine progetto)")
+    parser.add_argument('--aggregation', choices=AGGREGATION_LEVELS, default='Mensile', help="Livello di aggregazione (default: Mensile)")
+    parser.add_argument('--slack', type=int, default=0, help="Flessibilità totale massima (giorni) per le attività critiche (default: 0)")
+    parser.add_argument('--slack-source', choices=list(SLACK_COLUMNS), default='MS Project', help="Fonte della flessibilità totale: valori esportati (CPM dove mancano) o calcolo CPM nativo")
+    parser.add_argument('--rules', default=None, help="Profilo regole di classificazione risorse (JSON, o YAML con PyYAML)")
+    parser.add_argument('-o', '--output', default='report_infratrack', help="Cartella di destinazione dei report")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Processi paralleli (default: numero di core)")
+    parser.add_argument('--no-cache', action='store_true', help="Non usare la cache su disco dei progetti analizzati")
+    parser.add_argument('--version', action='version', version=f"InfraTrack {__version__}")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    files = expand_archives(find_project_files(args.inputs))
+    if not files: print("Nessun file .xml trovato.", file=sys.stderr); return 2
+    if args.start and args.end and args.start > args.end: print("La data di inizio deve precedere la data di fine.", file=sys.stderr); return 2
+    try: rules_profile = load_rule_profile(args.rules) if args.rules else None
+    except (OSError, ValueError) as e: print(f"Profilo regole non utilizzabile: {e}", file=sys.stderr); return 2
+    os.makedirs(args.output, exist_ok=True)
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(files)))
+    print(f"InfraTrack {__version__}: {len(files)} progetti, {workers} processi -> {os.path.abspath(args.output)}")
+    started = time.perf_counter(); rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_project_file, path, args.output, args.start, args.end, args.aggregation, args.slack, not args.no_cache, SLACK_COLUMNS[args.slack_source], rules_profile, member) for path, member in files]
+        for future in as_completed(futures):
+            row = future.result(); rows.append(row)
+            print(f"[{len(rows)}/{len(files)}] {row['Esito']:<6} {row['Secondi']:>8.2f}s  {os.path.basename(row['File'])}" + (f"  ({row['Errore']})" if row['Errore'] else ""))
+    order = {project_label(path, member): position for position, (path, member) in enumerate(files)}
+    rows.sort(key=lambda row: order[row['File']])
+    summary = write_run_summary(rows, args.output)
+    n_failed = int((summary['Esito'] != 'OK').sum())
+    print(f"Completato in {time.perf_counter() - started:.1f}s: {len(rows) - n_failed} report, {n_failed} errori.")
+    return 1 if n_failed else 0
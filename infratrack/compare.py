@@ -0,0 +1,121 @@
+# --- Confronto Baseline / Aggiornamenti (allineamento per UID attività) ---
+# Baseline contrattuale e aggiornamenti del cronoprogramma sono confrontati con join vettoriali sulle tabelle
+# attività estratte (all_tasks_data): solo le colonne necessarie entrano nel join, una riga per UID, quindi memoria
+# e tempo crescono linearmente (100k attività per file: decimi di secondo). Slittamenti in giorni di calendario
+# (positivo = in ritardo rispetto alla baseline), erosione della flessibilità positiva quando la flessibilità cala.
+import numpy as np
+import pandas as pd
+
+from .scurve import monthly_cost_series, daily_cost_series
+
+COMPARE_COLUMNS = ['UID', 'WBS', 'Name', 'Summary', 'Start', 'Finish', 'Cost', 'TotalSlackDays']
+STATUS_VALUES = ['Presente', 'Nuova', 'Rimossa']
+COL_START_SLIP = 'Slittamento Inizio (gg)'; COL_FINISH_SLIP = 'Slittamento Fine (gg)'
+COL_COST_DELTA = 'Delta Costo (€)'; COL_SLACK_EROSION = 'Erosione Flessibilità (gg)'
+
+
+def _task_slice(tasks):
+    # Colonne del confronto, un'attività per UID (UID duplicati nei file corrotti: vale la prima)
+    return tasks[[column for column in COMPARE_COLUMNS if column in tasks.columns]].drop_duplicates('UID')
+
+
+def _days(delta):
+    return delta.dt.days.astype('float64') if hasattr(delta, 'dt') else delta
+
+
+def compare_tasks(baseline_tasks, update_tasks):
+    # Una riga per UID presente in almeno una delle due versioni; colonne _Base / _Agg e delta per attività
+    merged = _task_slice(baseline_tasks).merge(_task_slice(update_tasks), on='UID', how='outer', suffixes=('_Base', '_Agg'), indicator=True, sort=False)
+    side = merged['_merge'].to_numpy()
+    status = np.select([side == 'right_only', side == 'left_only'], ['Nuova', 'Rimossa'], 'Presente')
+    return pd.DataFrame({
+        'UID': merged['UID'], 'WBS': merged['WBS_Agg'].fillna(merged['WBS_Base']), 'Name': merged['Name_Agg'].fillna(merged['Name_Base']),
+        'Stato': pd.Categorical(status, categories=STATUS_VALUES),
+        'Summary': merged['Summary_Agg'].fillna(merged['Summary_Base']).astype(bool),
+        'Start_Base': merged['Start_Base'], 'Start_Agg': merged['Start_Agg'], COL_START_SLIP: _days(merged['Start_Agg'] - merged['Start_Base']),
+        'Finish_Base': merged['Finish_Base'], 'Finish_Agg': merged['Finish_Agg'], COL_FINISH_SLIP: _days(merged['Finish_Agg'] - merged['Finish_Base']),
+        'Cost_Base': merged['Cost_Base'], 'Cost_Agg': merged['Cost_Agg'], COL_COST_DELTA: merged['Cost_Agg'].fillna(0) - merged['Cost_Base'].fillna(0),
+        'TotalSlackDays_Base': merged['TotalSlackDays_Base'], 'TotalSlackDays_Agg': merged['TotalSlackDays_Agg'],
+        COL_SLACK_EROSION: merged['TotalSlackDays_Base'].astype('float64') - merged['TotalSlackDays_Agg'].astype('float64'),
+    })
+
+
+def wbs_prefix(wbs_codes, level):
+    # Codice WBS troncato ai primi `level` livelli ("1.2.3.4", 2 -> "1.2")
+    return wbs_codes.astype(str).str.split('.', n=level).str[:level].str.join('.')
+
+
+def _wbs_sort_key(code):
+    # Ordine naturale dei codici WBS ("1.2" < "1.10")
+    return tuple((0, int(part), '') if part.isdigit() else (1, 0, part) for part in str(code).split('.'))
+
+
+def compare_wbs(task_deltas, level=2, wbs_name_map=None):
+    # Delta per nodo WBS al livello scelto, sulle sole attività foglia (i riepiloghi ripeterebbero i costi)
+    leaves = task_deltas[~task_deltas['Summary']]
+    if leaves.empty: return pd.DataFrame()
+    grouped = leaves.assign(Nodo=wbs_prefix(leaves['WBS'], level)).groupby('Nodo', sort=False)
+    summary = pd.DataFrame({
+        'Attività': grouped.size(), 'Nuove': grouped['Stato'].agg(lambda s: int((s == 'Nuova').sum())),
+        'Rimosse': grouped['Stato'].agg(lambda s: int((s == 'Rimossa').sum())),
+        'Costo Base (€)': grouped['Cost_Base'].sum(), 'Costo Aggiornamento (€)': grouped['Cost_Agg'].sum(), COL_COST_DELTA: grouped[COL_COST_DELTA].sum(),
+        'Slittamento Fine Max (gg)': grouped[COL_FINISH_SLIP].max(), 'Slittamento Fine Medio (gg)': grouped[COL_FINISH_SLIP].mean().round(1),
+        'Erosione Flessibilità Max (gg)': grouped[COL_SLACK_EROSION].max(),
+    }).reset_index()
+    summary = summary.iloc[sorted(range(len(summary)), key=lambda row: _wbs_sort_key(summary['Nodo'].iat[row]))]
+    summary.insert(1, 'Nome', summary['Nodo'].map(wbs_name_map or {}).fillna(''))
+    return summary.reset_index(drop=True)
+
+
+def compare_milestones(baseline_milestones, update_milestones):
+    # TUP/TUF allineati per chiave (es. "TUP 3"): slittamento della data di fine ed esito
+    columns = ['TupTufKey', 'Name', 'Finish']
+    empty = pd.DataFrame(columns=columns)
+    base = (baseline_milestones if baseline_milestones is not None else empty)[columns]
+    update = (update_milestones if update_milestones is not None else empty)[columns]
+    merged = base.merge(update, on='TupTufKey', how='outer', suffixes=('_Base', '_Agg'), indicator=True)
+    if merged.empty: return pd.DataFrame()
+    merged = merged.assign(_order=pd.to_datetime(merged['Finish_Base']).fillna(pd.to_datetime(merged['Finish_Agg']))).sort_values('_order', kind='stable', ignore_index=True)
+    slip = _days(pd.to_datetime(merged['Finish_Agg']) - pd.to_datetime(merged['Finish_Base']))
+    side = merged['_merge'].to_numpy()
+    outcome = np.select([side == 'right_only', side == 'left_only', slip.to_numpy() > 0, slip.to_numpy() < 0], ['Nuovo', 'Rimosso', 'Slittamento', 'Anticipo'], 'Invariato')
+    return pd.DataFrame({'Termine': merged['TupTufKey'], 'Nome': merged['Name_Agg'].fillna(merged['Name_Base']),
+                         'Fine Baseline': merged['Finish_Base'], 'Fine Aggiornamento': merged['Finish_Agg'], COL_FINISH_SLIP: slip, 'Esito': outcome})
+
+
+def scurve_overlay(versions, start_date=None, finish_date=None, aggregation_level='Mensile'):
+    # Curve S di più versioni sullo stesso asse: versions = [(etichetta, project_index)]; formato lungo
+    # Date / Versione / Value / Cumulato (il cumulato parte dall'inizio del periodo scelto)
+    series = []
+    for label, project_index in versions:
+        distribution = project_index.get('cost_distribution')
+        if distribution is None: continue
+        cost = monthly_cost_series(distribution, start_date, finish_date) if aggregation_level == 'Mensile' else daily_cost_series(distribution, start_date, finish_date)
+        if cost.empty: continue
+        series.append(cost.assign(Versione=label, Cumulato=cost['Value'].cumsum()))
+    if not series: return pd.DataFrame(columns=['Date', 'Versione', 'Value', 'Cumulato'])
+    return pd.concat(series, ignore_index=True)[['Date', 'Versione', 'Value', 'Cumulato']]
+
+
+def changed_tasks(task_deltas):
+    # Attività nuove, rimosse o con almeno un delta non nullo (date, costo, flessibilità)
+    deltas = task_deltas[[COL_START_SLIP, COL_FINISH_SLIP, COL_COST_DELTA, COL_SLACK_EROSION]].fillna(0).to_numpy()
+    return task_deltas[(task_deltas['Stato'] != 'Presente').to_numpy() | (deltas != 0).any(axis=1)]
+
+
+def _format_dates(values):
+    # gg/mm/aaaa formattando solo le date distinte (poche migliaia anche su 100k attività); NaT -> cella vuota
+    codes, uniques = pd.factorize(pd.to_datetime(values))
+    labels = np.append(np.asarray(pd.DatetimeIndex(uniques).strftime('%d/%m/%Y'), dtype=object), None)  # codice -1 (NaT) -> None
+    return pd.Series(labels[codes], index=values.index)
+
+
+def comparison_export_tables(task_deltas, wbs_deltas, milestone_deltas):
+    # Fogli Excel del confronto (date gg/mm/aaaa, solo attività cambiate, nuove o rimosse)
+    date_columns = ['Start_Base', 'Start_Agg', 'Finish_Base', 'Finish_Agg']
+    changed = changed_tasks(task_deltas)
+    changed = changed.assign(**{column: _format_dates(changed[column]) for column in date_columns})
+    sheets = [('Confronto Attività', changed.drop(columns=['Summary'])), ('Confronto WBS', wbs_deltas)]
+    if milestone_deltas is not None and not milestone_deltas.empty:
+        sheets.append(('Confronto TUP-TUF', milestone_deltas.assign(**{column: _format_dates(milestone_deltas[column]) for column in ('Fine Baseline', 'Fine Aggiornamento')})))
+    return sheets
@@ -0,0 +1,192 @@
+# --- Motore CPM (Critical Path Method) dai PredecessorLink MSPDI ---
+# La rete delle attività (foglie, durate in giorni lavorativi) è costruita con array NumPy in forma CSR;
+# ogni vincolo FS/SS/FF/SF diventa un arco "inizio -> inizio" con peso, quindi i passaggi in avanti e
+# all'indietro sono un cammino massimo in ordine topologico. Circa 0,5 s per 100k attività: il calcolo
+# avviene una volta al caricamento e la soglia di flessibilità si cambia senza ricalcolare.
+import numpy as np
+import pandas as pd
+
+from .schema import DATE_DTYPE
+
+MSP_NS = 'http://schemas.microsoft.com/project'
+_Q = '{' + MSP_NS + '}'
+TAG_PREDECESSOR_LINK = _Q + 'PredecessorLink'
+_TAG_TO_LINK_FIELD = {_Q + 'PredecessorUID': 'PredecessorUID', _Q + 'Type': 'Type', _Q + 'LinkLag': 'LinkLag', _Q + 'LagFormat': 'LagFormat'}
+LINK_FF, LINK_FS, LINK_SF, LINK_SS = 0, 1, 2, 3  # codici MSPDI di <Type>
+ELAPSED_LAG_FORMATS = {4, 6, 8, 10, 12}  # em, eh, ed, ew, emo: ritardo in tempo trascorso
+PERCENT_LAG_FORMATS = {19, 20}
+CPM_COLUMNS = ['CPMEarlyStart', 'CPMEarlyFinish', 'CPMLateStart', 'CPMLateFinish', 'CPMTotalSlackDays', 'CPMFreeSlackDays']
+
+
+def new_link_columns():
+    return {'SuccessorUID': [], 'PredecessorUID': [], 'Type': [], 'LinkLag': [], 'LagFormat': []}
+
+
+def append_predecessor_link(link_columns, successor_uid, link_elem):
+    values = dict.fromkeys(_TAG_TO_LINK_FIELD.values())
+    for child in link_elem:
+        field = _TAG_TO_LINK_FIELD.get(child.tag)
+        if field is not None: values[field] = child.text
+    link_columns['SuccessorUID'].append(successor_uid)
+    for field, value in values.items(): link_columns[field].append(value)
+
+
+def summary_leaves(task_wbs, is_summary, summaries):
+    # Foglie discendenti di ogni riepilogo: con i codici WBS ordinati sono un intervallo contiguo
+    # ["W.", "W/") (in ASCII '/' segue '.'), quindi bastano due searchsorted
+    leaf_positions = np.flatnonzero(~is_summary & (task_wbs != ''))
+    leaf_wbs = task_wbs[leaf_positions].astype(str); order = np.argsort(leaf_wbs, kind='stable')
+    leaf_wbs = leaf_wbs[order]; leaf_positions = leaf_positions[order]
+    summary_wbs = task_wbs[summaries].astype(str)
+    lo = np.searchsorted(leaf_wbs, np.char.add(summary_wbs, '.')); hi = np.searchsorted(leaf_wbs, np.char.add(summary_wbs, '/'))
+    counts = hi - lo
+    members = leaf_positions[np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+    return np.repeat(np.arange(len(summaries)), counts), members
+
+
+def _to_numbers(values, default):
+    # Pochi valori distinti (tipo link, formato e durata del ritardo): conversione sui soli valori unici
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    numbers = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').fillna(default).to_numpy(dtype=np.float64)
+    return np.where(codes >= 0, numbers[codes] if len(numbers) else default, default)
+
+
+def _link_positions(task_uids, link_uids):
+    # UID -> posizione nella tabella attività (prima occorrenza), -1 se il UID non esiste; un solo factorize
+    codes, uniques = pd.factorize(np.concatenate([np.asarray(task_uids, dtype=object), np.asarray(link_uids, dtype=object)]))
+    n_tasks = len(task_uids); position_by_code = np.full(len(uniques) + 1, -1, dtype=np.int64)
+    position_by_code[codes[:n_tasks][::-1]] = np.arange(n_tasks)[::-1]
+    return position_by_code[codes[n_tasks:]]
+
+
+def build_network(task_uids, task_wbs, is_summary, link_columns, minutes_per_day, working_days_per_week=5):
+    # link_columns: liste di new_link_columns o tabella df_links del progetto. Archi (pred, succ, tipo, ritardo in giorni lavorativi) tra posizioni della tabella attività.
+    # Un riepilogo collegato diventa due nodi virtuali di durata nulla (inizio e fine, posizioni >= len(task_uids)):
+    # inizio -> ogni foglia (SS) e ogni foglia -> fine (FS). Restituisce anche il numero di nodi virtuali.
+    empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0), 0)
+    n_links = len(link_columns['SuccessorUID'])
+    if n_links == 0: return empty
+    n_tasks = len(task_uids)
+    positions = _link_positions(task_uids, np.concatenate([np.asarray(link_columns['PredecessorUID'], dtype=object), np.asarray(link_columns['SuccessorUID'], dtype=object)]))
+    pred = positions[:n_links]; succ = positions[n_links:]
+    link_type = _to_numbers(link_columns['Type'], LINK_FS).astype(np.int64)
+    lag_format = _to_numbers(link_columns['LagFormat'], 7).astype(np.int64)
+    # LinkLag in decimi di minuto di lavoro; i ritardi in tempo trascorso sono riportati a giorni lavorativi
+    lag_minutes = _to_numbers(link_columns['LinkLag'], 0) / 10.0
+    lag_days = np.where(np.isin(lag_format, list(ELAPSED_LAG_FORMATS)), lag_minutes / 1440.0 * working_days_per_week / 7.0, lag_minutes / minutes_per_day)
+    lag_days = np.where(np.isin(lag_format, list(PERCENT_LAG_FORMATS)), 0.0, lag_days)  # ritardi percentuali non gestiti
+    valid = (pred >= 0) & (succ >= 0)
+    pred = pred[valid]; succ = succ[valid]; link_type = link_type[valid]; lag_days = lag_days[valid]
+    keep = pred != succ; pred = pred[keep]; succ = succ[keep]; link_type = link_type[keep]; lag_days = lag_days[keep]
+    summaries = np.unique(np.concatenate([pred[is_summary[pred]], succ[is_summary[succ]]]))
+    if len(summaries) == 0: return pred, succ, link_type, lag_days, 0
+    summary_index = np.full(n_tasks, -1, dtype=np.int64); summary_index[summaries] = np.arange(len(summaries))
+    start_node = n_tasks + summary_index; finish_node = n_tasks + len(summaries) + summary_index
+    # Lato predecessore: FS/FF partono dalla fine del riepilogo, SS/SF dall'inizio; lato successore: FS/SS
+    # vincolano l'inizio (e quindi le foglie), FF/SF la fine
+    from_finish = (link_type == LINK_FS) | (link_type == LINK_FF); to_start = (link_type == LINK_FS) | (link_type == LINK_SS)
+    pred = np.where(is_summary[pred], np.where(from_finish, finish_node[pred], start_node[pred]), pred)
+    succ = np.where(is_summary[succ], np.where(to_start, start_node[succ], finish_node[succ]), succ)
+    # Archi verso le foglie solo per i nodi effettivamente usati (un nodo fine inutilizzato limiterebbe la flessibilità libera)
+    owner, members = summary_leaves(task_wbs, is_summary, summaries)
+    used_nodes = np.concatenate([pred, succ])
+    start_used = np.isin(n_tasks + owner, used_nodes); finish_used = np.isin(n_tasks + len(summaries) + owner, used_nodes)
+    start_owner, start_members = owner[start_used], members[start_used]; finish_owner, finish_members = owner[finish_used], members[finish_used]
+    pred = np.concatenate([pred, n_tasks + start_owner, finish_members]); succ = np.concatenate([succ, start_members, n_tasks + len(summaries) + finish_owner])
+    link_type = np.concatenate([link_type, np.full(len(start_members), LINK_SS), np.full(len(finish_members), LINK_FS)])
+    lag_days = np.concatenate([lag_days, np.zeros(len(start_members) + len(finish_members))])
+    return pred, succ, link_type, lag_days, 2 * len(summaries)
+
+
+def forward_pass(n_nodes, pred, succ, weight, start_bound=None):
+    # Kahn sugli archi in forma CSR (ordinati per predecessore) con il rilassamento ES[s] >= ES[p] + peso nello
+    # stesso giro. Un passo Python per nodo/arco: costo lineare indipendente dalla profondità della rete (una
+    # catena di 100k attività costa quanto una rete larga). I nodi in un ciclo o a valle di un ciclo restano fuori.
+    # start_bound: inizio minimo per nodo (come un vincolo "inizia non prima del"), altrimenti l'inizio progetto
+    indegree = np.bincount(succ, minlength=n_nodes).tolist()
+    bounds = np.searchsorted(pred, np.arange(n_nodes + 1)).tolist(); targets = succ.tolist(); weights = weight.tolist()
+    early_start = [0.0] * n_nodes if start_bound is None else np.maximum(start_bound, 0.0).tolist()  # >= 0: nessuna attività prima dell'inizio progetto
+    stack = np.flatnonzero(np.asarray(indegree) == 0).tolist(); order = []
+    while stack:
+        node = stack.pop(); order.append(node); start = early_start[node]
+        for k in range(bounds[node], bounds[node + 1]):
+            target = targets[k]; candidate = start + weights[k]
+            if candidate > early_start[target]: early_start[target] = candidate
+            indegree[target] -= 1
+            if indegree[target] == 0: stack.append(target)
+    return np.asarray(order, dtype=np.int64), np.asarray(early_start)
+
+
+def backward_pass(order, pred, succ, weight, late_start):
+    # LS[p] <= LS[s] - peso, nodi in ordine topologico inverso (archi già limitati ai nodi della rete)
+    bounds = np.searchsorted(pred, np.arange(len(late_start) + 1)).tolist(); targets = succ.tolist(); weights = weight.tolist()
+    late_start = late_start.tolist()
+    for node in order[::-1].tolist():
+        latest = late_start[node]
+        for k in range(bounds[node], bounds[node + 1]):
+            candidate = late_start[targets[k]] - weights[k]
+            if candidate < latest: latest = candidate
+        late_start[node] = latest
+    return np.asarray(late_start)
+
+
+def compute_schedule(durations, pred, succ, link_type, lag_days, start_bound=None):
+    # Inizi/fine al più presto e al più tardi (giorni lavorativi dall'inizio progetto), flessibilità totale e libera.
+    # Ogni vincolo diventa ES[s] >= ES[p] + peso, con peso = lag + D[p] (FS, FF) - D[s] (FF, SF). start_bound: vedi forward_pass
+    n_nodes = len(durations)
+    by_pred = np.argsort(pred, kind='stable'); pred = pred[by_pred]; succ = succ[by_pred]; link_type = link_type[by_pred]
+    weight = lag_days[by_pred] + np.where((link_type == LINK_FS) | (link_type == LINK_FF), durations[pred], 0.0) \
+                               - np.where((link_type == LINK_FF) | (link_type == LINK_SF), durations[succ], 0.0)
+    order, early_start = forward_pass(n_nodes, pred, succ, weight, start_bound)
+    in_network = np.zeros(n_nodes, dtype=bool); in_network[order] = True
+    edge_ok = in_network[pred] & in_network[succ]; pred = pred[edge_ok]; succ = succ[edge_ok]; weight = weight[edge_ok]
+    early_finish = early_start + durations
+    project_finish = early_finish[in_network].max() if in_network.any() else 0.0
+    late_start = backward_pass(order, pred, succ, weight, project_finish - durations); late_finish = late_start + durations
+    free_slack = project_finish - early_finish
+    if len(pred): np.minimum.at(free_slack, pred, early_start[succ] - weight - early_start[pred])
+    total_slack = late_start - early_start
+    for values in (early_start, early_finish, late_start, late_finish, total_slack, free_slack): values[~in_network] = np.nan
+    return {'EarlyStart': early_start, 'EarlyFinish': early_finish, 'LateStart': late_start, 'LateFinish': late_finish,
+            'TotalSlack': total_slack, 'FreeSlack': free_slack, 'InNetwork': in_network}
+
+
+def working_day_dates(project_start, offsets, busdaycal):
+    # Offset in giorni lavorativi -> date (NaT dove l'offset manca)
+    result = np.full(len(offsets), np.datetime64('NaT'), dtype='datetime64[D]')
+    valid = ~np.isnan(offsets)
+    if busdaycal is None or not valid.any(): return result
+    start = np.busday_offset(np.datetime64(project_start, 'D'), 0, roll='forward', busdaycal=busdaycal)
+    result[valid] = np.busday_offset(start, offsets[valid].astype(np.int64), roll='forward', busdaycal=busdaycal)
+    return result
+
+
+def _to_date_column(values):
+    # datetime64[D] -> colonna data dello schema compatto, come Start/Finish
+    return values.astype(DATE_DTYPE)
+
+
+def compute_cpm(task_table, link_columns, minutes_per_day, project_start, calendar):
+    # Colonne CPM_COLUMNS allineate a task_table (None/NaN per riepiloghi, UID 0 e attività in cicli).
+    # Durate e flessibilità in giorni lavorativi del calendario di progetto.
+    task_uids = task_table['UID'].to_numpy(dtype=object); task_wbs = task_table['WBS'].to_numpy(dtype=object)
+    is_summary = (task_table['Summary'].to_numpy(dtype=bool)) | (task_uids == '0')
+    durations = np.where(is_summary, 0.0, task_table['DurationSeconds'].to_numpy(dtype=np.float64) / 60.0 / minutes_per_day)
+    pred, succ, link_type, lag_days, n_virtual = build_network(task_uids, task_wbs, is_summary, link_columns, minutes_per_day, int(calendar['weekmask'].sum()) or 5)
+    schedule = compute_schedule(np.concatenate([durations, np.zeros(n_virtual)]), pred, succ, link_type, lag_days)
+    schedule = {name: values[:len(task_uids)] for name, values in schedule.items()}
+    leaf = ~is_summary & schedule['InNetwork']
+    early_start = np.where(leaf, schedule['EarlyStart'], np.nan); late_start = np.where(leaf, schedule['LateStart'], np.nan)
+    early_finish = np.where(leaf, schedule['EarlyFinish'], np.nan); late_finish = np.where(leaf, schedule['LateFinish'], np.nan)
+    # Giorno di fine = ultimo giorno lavorativo occupato (le milestone finiscono il giorno in cui iniziano)
+    last_early = np.maximum(np.ceil(early_finish - 1e-9) - 1, np.floor(early_start + 1e-9))
+    last_late = np.maximum(np.ceil(late_finish - 1e-9) - 1, np.floor(late_start + 1e-9))
+    busdaycal = calendar['busdaycal']
+    return pd.DataFrame({
+        'CPMEarlyStart': _to_date_column(working_day_dates(project_start, np.floor(early_start + 1e-9), busdaycal)),
+        'CPMEarlyFinish': _to_date_column(working_day_dates(project_start, last_early, busdaycal)),
+        'CPMLateStart': _to_date_column(working_day_dates(project_start, np.floor(late_start + 1e-9), busdaycal)),
+        'CPMLateFinish': _to_date_column(working_day_dates(project_start, last_late, busdaycal)),
+        'CPMTotalSlackDays': np.round(np.where(leaf, schedule['TotalSlack'], np.nan), 2),
+        'CPMFreeSlackDays': np.round(np.where(leaf, schedule['FreeSlack'], np.nan), 2),
+    }, index=task_table.index)
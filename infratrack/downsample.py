@@ -0,0 +1,55 @@
+# --- Sottocampionamento lato server per i grafici giornalieri (LTTB / min-max) ---
+# Oltre DOWNSAMPLE_THRESHOLD punti per serie i grafici passano a tracce WebGL (Scattergl) e al browser
+# arrivano al più DOWNSAMPLE_POINTS punti per serie, scelti sul periodo selezionato. Le funzioni
+# restituiscono indici: customdata/etichette si selezionano con gli stessi indici e le tabelle e gli
+# export Excel restano a piena risoluzione.
+import numpy as np
+
+DOWNSAMPLE_THRESHOLD = 2000
+DOWNSAMPLE_POINTS = 1500
+
+
+def _as_numeric(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64): return x.astype('datetime64[D]').astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out=DOWNSAMPLE_POINTS):
+    # Largest-Triangle-Three-Buckets: primo e ultimo punto fissi, per ogni bucket il punto che forma il
+    # triangolo di area massima con il punto scelto prima e la media del bucket successivo (forma della curva)
+    y = np.asarray(y, dtype=np.float64); n = len(y)
+    if n <= n_out or n_out < 3: return np.arange(n)
+    x = _as_numeric(x)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 bucket interni
+    selected = np.empty(n_out, dtype=np.int64); selected[0] = 0; selected[-1] = n - 1; previous = 0
+    for bucket in range(n_out - 2):
+        first, end = edges[bucket], edges[bucket + 1]
+        next_first, next_end = end, (edges[bucket + 2] if bucket + 2 < len(edges) else n)
+        mean_x = x[next_first:next_end].mean(); mean_y = y[next_first:next_end].mean()
+        area = np.abs((x[previous] - mean_x) * (y[first:end] - y[previous]) - (x[previous] - x[first:end]) * (mean_y - y[previous]))
+        previous = selected[bucket + 1] = first + int(np.argmax(area))
+    return selected
+
+
+def minmax_indices(y, n_out=DOWNSAMPLE_POINTS):
+    # Minimo e massimo di ogni bucket (picchi conservati: adatto a costi/unità giornaliere), ordine originale
+    y = np.asarray(y, dtype=np.float64); n = len(y); n_buckets = max((n_out - 2) // 2, 1)
+    if n <= n_out: return np.arange(n)
+    size = -(-n // n_buckets)
+    padded = np.full(n_buckets * size, np.nan); padded[:n] = y; blocks = padded.reshape(n_buckets, size)
+    valid = ~np.isnan(blocks).all(axis=1); offsets = np.arange(n_buckets)[valid] * size
+    blocks = blocks[valid]
+    return np.unique(np.concatenate([offsets + np.nanargmin(blocks, axis=1), offsets + np.nanargmax(blocks, axis=1), [0, n - 1]]))
+
+
+def needs_webgl(n_points, threshold=DOWNSAMPLE_THRESHOLD):
+    return n_points > threshold
+
+
+def downsample_frame(df, y_column, x_column='Date', method='minmax', n_out=DOWNSAMPLE_POINTS):
+    # Righe del DataFrame (già ordinato per x) da inviare al grafico; sotto n_out punti restituisce df invariato
+    if len(df) <= n_out: return df
+    y = df[y_column].to_numpy(dtype=np.float64)
+    positions = minmax_indices(y, n_out) if method == 'minmax' else lttb_indices(df[x_column].to_numpy(), y, n_out)
+    return df.iloc[positions]
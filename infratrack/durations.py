@@ -0,0 +1,44 @@
+# --- Durate ISO 8601 (formato MSPDI, es. PT8H0M0S) in forma vettoriale ---
+import numpy as np
+import pandas as pd
+
+# Anni/mesi non hanno una durata fissa: come isodate+total_seconds() vengono trattati come non validi
+_ISO_DURATION_PATTERN = (r'^P(?:(?P<W>\d+(?:\.\d+)?)W)?(?:(?P<D>\d+(?:\.\d+)?)D)?'
+                         r'(?:T(?:(?P<H>\d+(?:\.\d+)?)H)?(?:(?P<M>\d+(?:\.\d+)?)M)?(?:(?P<S>\d+(?:\.\d+)?)S)?)?$')
+_UNIT_SECONDS = {'W': 604800.0, 'D': 86400.0, 'H': 3600.0, 'M': 60.0, 'S': 1.0}
+
+
+def parse_iso_durations(values):
+    # Restituisce un array float64 di secondi (NaN se la stringa manca o non è valida).
+    # Le stringhe distinte sono poche (PT8H0M0S, PT16H0M0S, ...): si analizzano solo i valori unici.
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    if len(uniques) == 0: return np.full(len(codes), np.nan)
+    unique_str = pd.Series(uniques, dtype=object).astype(str)
+    unique_str = unique_str.where(~unique_str.str.startswith('T'), 'P' + unique_str)
+    parts = unique_str.str.extract(_ISO_DURATION_PATTERN)
+    valid = parts.notna().any(axis=1).to_numpy()
+    unique_seconds = np.zeros(len(uniques))
+    for unit, factor in _UNIT_SECONDS.items():
+        unique_seconds += pd.to_numeric(parts[unit], errors='coerce').fillna(0).to_numpy() * factor
+    unique_seconds[~valid] = np.nan
+    seconds = np.full(len(codes), np.nan)
+    mask = codes >= 0
+    seconds[mask] = unique_seconds[codes[mask]]
+    return seconds
+
+
+def format_durations(duration_values, minutes_per_day):
+    # Equivalente vettoriale della vecchia format_duration_from_xml: "<n>g" giorni lavorativi,
+    # "0g" per durate assenti o nulle, "N/D" per valori non interpretabili
+    raw = pd.Series(duration_values, dtype=object)
+    seconds = parse_iso_durations(raw)
+    result = np.full(len(raw), "N/D", dtype=object)
+    missing = raw.isna().to_numpy() | (raw == '').to_numpy()
+    if minutes_per_day <= 0:
+        result[:] = "0g"; return result
+    zero = ~missing & (seconds == 0)
+    positive = ~missing & ~np.isnan(seconds) & (seconds != 0)
+    work_days = np.rint(seconds[positive] / 3600 / (minutes_per_day / 60.0)).astype(np.int64)
+    result[positive] = [f"{d}g" for d in work_days]
+    result[missing | zero] = "0g"
+    return result
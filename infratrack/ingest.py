@@ -0,0 +1,45 @@
+# --- Caricamento Baseline in Background ---
+# Il caricamento (SHA-256, cache su disco o parsing, indice di progetto) gira in un pool di thread di processo:
+# lo script Streamlit avvia il lavoro, ne legge l'avanzamento (infratrack.progress) a ogni ciclo e resta libero
+# di reagire a un nuovo upload o al reset, che annullano il lavoro in corso. Thread e non processi: il risultato
+# entra nell'archivio condiviso (infratrack.store) senza serializzare le tabelle, e le sessioni non restano più in
+# coda dietro lo script di chi sta caricando un file molto grande.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .profiling import stage
+from .progress import new_progress, source_size, report, cancel, IngestionCancelled
+from .store import acquire_project
+
+INGEST_WORKERS = int(os.environ.get('INFRATRACK_INGEST_WORKERS', '2'))
+POLL_SECONDS = 0.5  # intervallo di aggiornamento della barra di avanzamento nell'app
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix='infratrack-ingest')
+
+
+def _ingest(source, label, profile, progress, member):
+    report(progress, "Avvio")  # annullato mentre era in coda: non si legge nemmeno il file
+    size_mb = round((progress['bytes_total'] or 0) / 2 ** 20, 1)
+    with stage(profile, "Caricamento baseline", 'app', file=label or '', MB=size_mb): shared_project = acquire_project(source, label, profile=profile, progress=progress, member=member)
+    report(progress, "Completato")
+    return shared_project
+
+
+def start_ingestion(source, label=None, profile=None, member=None):
+    # Lavoro di caricamento: dict con source, member, label, progress e future (risultato = dict di store.acquire_project)
+    progress = new_progress(source_size(source))
+    return {'source': source, 'member': member, 'label': label, 'progress': progress, 'future': _executor.submit(_ingest, source, label, profile, progress, member)}
+
+
+def cancel_ingestion(job):
+    # Annullamento cooperativo: il thread si ferma al prossimo controllo (al più REPORT_EVERY elementi XML)
+    if job is not None: cancel(job['progress'])
+
+
+def ingestion_status(job):
+    # 'in corso', 'completato', 'annullato' o 'errore'
+    future = job['future']
+    if not future.done(): return 'in corso'
+    error = future.exception()
+    if error is None: return 'completato'
+    return 'annullato' if isinstance(error, IngestionCancelled) else 'errore'
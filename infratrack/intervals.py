@@ -0,0 +1,51 @@
+# --- Indici per Interrogazioni sul Periodo (estremi ordinati + ricerca binaria) ---
+# Costruiti una volta per progetto: cambiare "Data Inizio/Data Fine" non richiede più copie del DataFrame,
+# conversioni di date o maschere sull'intera tabella, solo searchsorted sugli array ordinati.
+import numpy as np
+import pandas as pd
+
+
+def to_days(values):
+    return pd.to_datetime(pd.Series(values), errors='coerce').to_numpy(dtype='datetime64[D]')
+
+
+def _period_day(value):
+    return np.datetime64('NaT', 'D') if value is None else np.datetime64(value, 'D')
+
+
+def build_interval_index(starts, finishes, subset=None):
+    # Intervalli [start, finish] (date incluse); subset = maschera delle righe indicizzabili (es. non riepilogo)
+    start = to_days(starts); finish = to_days(finishes)
+    valid = ~np.isnat(start) & ~np.isnat(finish)
+    if subset is not None: valid &= np.asarray(subset, dtype=bool)
+    positions = np.flatnonzero(valid)
+    by_start = positions[np.argsort(start[positions], kind='stable')]; by_finish = positions[np.argsort(finish[positions], kind='stable')]
+    return {'n_rows': len(start), 'by_start': by_start, 'start_sorted': start[by_start],
+            'by_finish': by_finish, 'finish_sorted': finish[by_finish]}
+
+
+def overlap_mask(index, period_start, period_finish):
+    # Righe con start <= fine periodo e finish >= inizio periodo: due ricerche binarie, poi i prefissi ordinati
+    # (start <= F) meno (finish < S). Esatto anche per intervalli con start > finish.
+    starting = np.searchsorted(index['start_sorted'], _period_day(period_finish), side='right')
+    ended = np.searchsorted(index['finish_sorted'], _period_day(period_start), side='left')
+    mask = np.zeros(index['n_rows'], dtype=bool)
+    mask[index['by_start'][:starting]] = True; mask[index['by_finish'][:ended]] = False
+    return mask
+
+
+def build_value_index(values, subset=None):
+    # Ordine crescente dei valori (es. flessibilità) per le soglie "<= x"
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    if subset is not None: valid &= np.asarray(subset, dtype=bool)
+    positions = np.flatnonzero(valid)
+    order = positions[np.argsort(values[positions], kind='stable')]
+    return {'n_rows': len(values), 'order': order, 'sorted': values[order]}
+
+
+def at_most_mask(index, threshold):
+    mask = np.zeros(index['n_rows'], dtype=bool)
+    mask[index['order'][:np.searchsorted(index['sorted'], threshold, side='right')]] = True
+    return mask
+
@@ -0,0 +1,145 @@
+# --- Caricamento Streaming MSPDI (etree.iterparse, un solo passaggio) ---
+# Legge Calendars, Tasks, Resources e Assignments in un'unica scansione del file e libera
+# ogni elemento appena consumato: il picco di memoria non dipende più dalla quantità di
+# TimephasedData presenti nella baseline.
+from lxml import etree
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+
+from .archives import open_xml
+from .calendars import parse_calendar, resolve_calendars, default_calendar_spec, compile_calendar, STANDARD_CALENDAR_UID
+from .cpm import new_link_columns, compute_cpm
+from .profiling import stage
+from .progress import report, REPORT_EVERY
+from .resources import resource_classification_table
+from .schema import TASK_DTYPES, LINK_DTYPES, ASSIGNMENT_DTYPES, compact_table, scalar_date
+from .tasks import TASK_COLUMNS, new_task_columns, append_task, build_task_table, select_milestones, build_milestones
+from .timephased import new_timephased_columns, new_assignment_columns, append_assignment, build_timephased_work
+
+MSP_NS = 'http://schemas.microsoft.com/project'
+NS = {'msp': MSP_NS}
+_Q = '{' + MSP_NS + '}'
+TAG_CALENDAR = _Q + 'Calendar'; TAG_TASK = _Q + 'Task'; TAG_RESOURCE = _Q + 'Resource'; TAG_ASSIGNMENT = _Q + 'Assignment'
+TAG_PROJECT = _Q + 'Project'; TAG_CALENDAR_UID = _Q + 'CalendarUID'; TAG_MINUTES_PER_DAY = _Q + 'MinutesPerDay'
+DEFAULT_MINUTES_PER_DAY = 480
+# Da incrementare quando cambia il contenuto delle tabelle estratte (invalida la cache su disco)
+PARSER_VERSION = 7
+
+
+def _release(elem):
+    # Svuota l'elemento e rimuove i fratelli precedenti già elaborati (memoria costante)
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None: del parent[0]
+
+
+def _scan_progress(progress, handle, task_columns, n_assignments, timephased_columns):
+    report(progress, bytes_read=handle.tell(), tasks=len(task_columns['UID']), assignments=n_assignments, timephased_rows=len(timephased_columns['Start']))
+
+
+def scan_project(source, progress=None, member=None):
+    # Scansione iterparse di load_project (anche per benchmarks/bench_pipeline.py): colonne grezze di attività, link,
+    # timephased e assegnazioni, risorse, calendari e impostazioni di progetto (CalendarUID, MinutesPerDay)
+    header = {}; calendar_specs = {}
+    task_columns = new_task_columns(); link_columns = new_link_columns(); timephased_columns = new_timephased_columns(); assignment_columns = new_assignment_columns()
+    resource_map = {}; resource_calendars = {}
+    # Decompressione a flusso; l'avanzamento è misurato sul file (compresso) con tell()
+    with open_xml(source, member) as (stream, handle):
+        context = etree.iterparse(stream, events=('end',), tag=(TAG_CALENDAR, TAG_TASK, TAG_RESOURCE, TAG_ASSIGNMENT, TAG_CALENDAR_UID, TAG_MINUTES_PER_DAY), recover=True, huge_tree=True)
+        n_elements = 0; n_assignments = 0
+        for _, elem in context:
+            n_elements += 1
+            if progress is not None and n_elements % REPORT_EVERY == 0: _scan_progress(progress, handle, task_columns, n_assignments, timephased_columns)
+            tag = elem.tag
+            if tag == TAG_CALENDAR_UID or tag == TAG_MINUTES_PER_DAY:
+                # Impostazioni di progetto (figli diretti di <Project>); quelli dentro Task/Resource si leggono dopo
+                parent = elem.getparent()
+                if parent is not None and parent.tag == TAG_PROJECT: header[tag] = elem.text
+                continue
+            if tag == TAG_TASK: append_task(task_columns, elem, link_columns)
+            elif tag == TAG_ASSIGNMENT: append_assignment(timephased_columns, elem, assignment_columns); n_assignments += 1
+            elif tag == TAG_RESOURCE:
+                uid = elem.findtext('msp:UID', namespaces=NS)
+                if uid:
+                    resource_map[uid] = elem.findtext('msp:Name', namespaces=NS) or f"Risorsa UID {uid}"
+                    resource_calendars[uid] = elem.findtext('msp:CalendarUID', namespaces=NS) or '-1'
+            elif tag == TAG_CALENDAR:
+                calendar_spec = parse_calendar(elem, NS)
+                if calendar_spec['UID']: calendar_specs[calendar_spec['UID']] = calendar_spec
+            _release(elem)
+        del context
+        if progress is not None: _scan_progress(progress, handle, task_columns, n_assignments, timephased_columns)
+    return {'header': header, 'calendar_specs': calendar_specs, 'task_columns': task_columns, 'link_columns': link_columns, 'timephased_columns': timephased_columns,
+            'assignment_columns': assignment_columns, 'resource_map': resource_map, 'resource_calendars': resource_calendars}
+
+
+def load_project(source, profile=None, progress=None, member=None):
+    # source: percorso o oggetto file-like (es. UploadedFile di Streamlit), XML o compresso (infratrack.archives;
+    # member = file XML scelto in un .zip). Restituisce un dict con le stesse chiavi usate in st.session_state
+    # dall'app. profile: infratrack.profiling (tempi per fase); progress: infratrack.progress (avanzamento letto
+    # da un altro thread, annullamento tra blocchi di elementi)
+    report(progress, "Scansione XML")
+    with stage(profile, "Scansione XML (attività, risorse, assegnazioni)", 'parse'): scanned = scan_project(source, progress, member)
+    header = scanned['header']; calendar_specs = scanned['calendar_specs']; resource_map = scanned['resource_map']; resource_calendars = scanned['resource_calendars']
+    task_columns = scanned['task_columns']; link_columns = scanned['link_columns']; timephased_columns = scanned['timephased_columns']; assignment_columns = scanned['assignment_columns']
+    del scanned
+
+    # --- Calendari: quello di progetto da <CalendarUID> (default UID 1), Standard lun-ven 8h se assente ---
+    calendars = resolve_calendars(calendar_specs)
+    project_calendar_uid = header.get(TAG_CALENDAR_UID) if header.get(TAG_CALENDAR_UID) in calendars else STANDARD_CALENDAR_UID
+    if project_calendar_uid not in calendars: calendars[project_calendar_uid] = default_calendar_spec()
+    # Minuti per giorno per la conversione delle durate: opzione di progetto MinutesPerDay, altrimenti il calendario
+    project_calendar = compile_calendar(calendars[project_calendar_uid])
+    try: minutes_per_day = float(header[TAG_MINUTES_PER_DAY])
+    except (KeyError, TypeError, ValueError): minutes_per_day = project_calendar['minutes_per_day']
+    if minutes_per_day <= 0: minutes_per_day = DEFAULT_MINUTES_PER_DAY
+
+    report(progress, "Tabella attività")
+    with stage(profile, "Tabella attività", 'parse', righe=len(task_columns['UID'])): task_table = build_task_table(task_columns, minutes_per_day)
+    del task_columns
+
+    # --- Informazioni generali (Task UID 1 = riepilogo progetto) ---
+    project_name = "N/D"; formatted_cost = "€ 0,00"; project_start_date = None; project_finish_date = None
+    summary_rows = task_table.index[task_table['UID'] == '1']
+    if len(summary_rows):
+        summary_task = task_table.loc[summary_rows[0]]
+        project_name = summary_task["Name"] or "N/D"
+        formatted_cost = f"€ {summary_task['Cost']:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        project_start_date = scalar_date(summary_task["Start"]); project_finish_date = scalar_date(summary_task["Finish"])
+    if not project_start_date: project_start_date = date.today()
+    if not project_finish_date: project_finish_date = project_start_date + timedelta(days=365)
+    if project_start_date > project_finish_date: project_finish_date = project_start_date + timedelta(days=1)
+
+    # --- Percorso critico: CPM nativo dai PredecessorLink; la flessibilità esportata da MS Project resta
+    # prioritaria, il CPM copre le attività senza EarlyFinish/LateFinish (file non schedulati o parziali) ---
+    report(progress, "Percorso critico (CPM)")
+    with stage(profile, "CPM", 'parse', link=len(link_columns['SuccessorUID'])): task_table = task_table.join(compute_cpm(task_table, link_columns, minutes_per_day, project_start_date, project_calendar))
+    # Rete e assegnazioni restano come tabelle compatte: la simulazione dei rischi ricostruisce la rete su richiesta
+    links = compact_table(pd.DataFrame(link_columns), LINK_DTYPES); del link_columns
+    assignments = compact_table(pd.DataFrame(assignment_columns), ASSIGNMENT_DTYPES); del assignment_columns
+    exported_slack = task_table['TotalSlackDays'].notna()
+    task_table['SlackSource'] = np.where(exported_slack, 'MS Project', np.where(task_table['CPMTotalSlackDays'].notna(), 'CPM', 'N/D'))
+    task_table['TotalSlackDays'] = task_table['TotalSlackDays'].fillna(task_table['CPMTotalSlackDays']).fillna(0).round().astype(np.int32)
+
+    # --- Tabella attività e mappa WBS->Nome ---
+    named_wbs = task_table[(task_table['WBS'] != "") & (task_table['Name'] != "")]
+    wbs_name_map = dict(zip(named_wbs['WBS'], named_wbs['Name']))
+    all_tasks_data = compact_table(task_table.loc[task_table['UID'] != '0', TASK_COLUMNS].reset_index(drop=True), TASK_DTYPES)
+    if all_tasks_data.empty: all_tasks_data = pd.DataFrame()
+
+    # --- Lavoro Timephased (Type=1) per risorsa, ripartito sui giorni lavorativi ---
+    report(progress, "Lavoro timephased")
+    with stage(profile, "Lavoro timephased", 'parse', record=len(timephased_columns['Start'])):
+        timephased_work_data = build_timephased_work(timephased_columns, resource_map, resource_calendars, calendars, project_calendar_uid)
+    del timephased_columns
+
+    resource_classification_debug = resource_classification_table(resource_map)
+    milestones = select_milestones(task_table)  # TUP/TUF tipizzati (confronto tra versioni), più la tabella da mostrare
+    return {'minutes_per_day': minutes_per_day, 'project_name': project_name, 'formatted_cost': formatted_cost,
+            'project_total_cost_from_summary': formatted_cost, 'project_start_date': project_start_date, 'project_finish_date': project_finish_date,
+            'wbs_name_map': wbs_name_map, 'df_milestones': milestones, 'df_milestones_display': build_milestones(milestones),
+            'all_tasks_data': all_tasks_data, 'df_links': links, 'df_assignments': assignments, 'resource_map': resource_map, 'timephased_work_data': timephased_work_data,
+            'resource_classification_debug': resource_classification_debug,
+            'calendars': calendars, 'project_calendar_uid': project_calendar_uid, 'resource_calendars': resource_calendars}
@@ -0,0 +1,19 @@
+# --- Locale Italiano per i nomi dei mesi (strftime '%b') ---
+# Impostato una sola volta per processo: le riesecuzioni dello script Streamlit e i report della CLI non
+# ripetono setlocale (chiamata globale e non thread-safe).
+import locale
+
+_LOCALE_CANDIDATES = ('it_IT.UTF-8', 'italian', '')
+_locale_name = None; _locale_done = False
+
+
+def ensure_italian_locale():
+    # Restituisce il locale impostato ('' = quello di sistema), None se nessuno è disponibile
+    global _locale_name, _locale_done
+    if _locale_done: return _locale_name
+    _locale_done = True
+    for candidate in _LOCALE_CANDIDATES:
+        try: locale.setlocale(locale.LC_TIME, candidate); _locale_name = candidate; break
+        except locale.Error: continue
+    else: print("WARNING: Impossibile impostare qualsiasi locale per i nomi dei mesi.")
+    return _locale_name
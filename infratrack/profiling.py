@@ -0,0 +1,111 @@
+# --- Strumentazione delle Fasi (tempo, CPU, memoria) ---
+# Ogni fase della pipeline (lettura upload, scansione XML, tabelle, analisi, export, immagini) è racchiusa in
+# `with stage(profile, "nome"):`. Con profile = None il contesto non misura nulla (costo trascurabile), quindi
+# loader e CLI restano invariati quando la profilazione non serve. Per ogni fase: tempo reale, tempo CPU del
+# processo, RSS corrente e di picco del processo e, se richiesto, picco di memoria Python (tracemalloc, più lento).
+# Le fasi annidate sono registrate con la profondità; l'esportazione in formato Chrome trace (eventi "X")
+# si apre in chrome://tracing o in Perfetto.
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: niente getrusage
+    resource = None
+
+MAX_RECORDS = 500  # l'app accumula le fasi di tutte le interazioni: si tengono le più recenti
+
+
+def new_profile(label=None, trace_memory=False):
+    return {'label': label, 'trace_memory': trace_memory, 'created': datetime.now().isoformat(timespec='seconds'),
+            'origin': time.perf_counter(), 'records': [], 'stack': [], 'started_tracemalloc': False}
+
+
+def current_rss_mb():
+    # RSS attuale da /proc (Linux); None dove non disponibile
+    try:
+        with open('/proc/self/statm') as f: return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError): return None
+
+
+def peak_rss_mb():
+    # Picco RSS dall'avvio del processo (ru_maxrss: KB su Linux, byte su macOS)
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def _start_memory(profile):
+    if not profile['trace_memory']: return None
+    if not tracemalloc.is_tracing(): tracemalloc.start(); profile['started_tracemalloc'] = True
+    current, peak = tracemalloc.get_traced_memory()
+    if profile['stack']: profile['stack'][-1]['max_peak'] = max(profile['stack'][-1]['max_peak'], peak)
+    tracemalloc.reset_peak()
+    return current
+
+
+def _stop_memory(profile, frame):
+    # Picco della fase al netto della memoria già allocata all'ingresso; il picco viene riportato alla fase madre
+    if frame['memory_start'] is None or not tracemalloc.is_tracing(): return None
+    _, peak = tracemalloc.get_traced_memory(); peak = max(peak, frame['max_peak'])
+    if profile['stack']: profile['stack'][-1]['max_peak'] = max(profile['stack'][-1]['max_peak'], peak)
+    elif profile['started_tracemalloc']: tracemalloc.stop(); profile['started_tracemalloc'] = False
+    return max(peak - frame['memory_start'], 0) / 2 ** 20
+
+
+@contextmanager
+def stage(profile, name, category='pipeline', **details):
+    # details: informazioni aggiuntive della fase (righe, file, livello di aggregazione...), esportate negli args
+    if profile is None: yield; return
+    frame = {'name': name, 'memory_start': None, 'max_peak': 0}
+    frame['memory_start'] = _start_memory(profile); profile['stack'].append(frame)
+    wall_start = time.perf_counter(); cpu_start = time.process_time()
+    error = None
+    try: yield
+    except BaseException as e: error = type(e).__name__; raise
+    finally:
+        wall = time.perf_counter() - wall_start; cpu = time.process_time() - cpu_start
+        profile['stack'].pop()
+        record = {'name': name, 'category': category, 'depth': len(profile['stack']), 'start': wall_start - profile['origin'],
+                  'seconds': wall, 'cpu_seconds': cpu, 'rss_mb': current_rss_mb(), 'peak_rss_mb': peak_rss_mb(),
+                  'python_peak_mb': _stop_memory(profile, frame), 'thread': threading.get_ident(), 'error': error, 'details': details}
+        profile['records'].append(record)
+        if len(profile['records']) > MAX_RECORDS: del profile['records'][:len(profile['records']) - MAX_RECORDS]
+
+
+def profile_table(profile):
+    # Tabella per l'expander "Prestazioni" (fasi annidate rientrate nel nome)
+    columns = ['Fase', 'Categoria', 'Inizio (s)', 'Durata (s)', 'CPU (s)', 'RSS (MB)', 'Picco RSS (MB)', 'Picco Python (MB)', 'Dettagli']
+    if profile is None or not profile['records']: return pd.DataFrame(columns=columns)
+    rows = [{'Fase': ' ' * record['depth'] + record['name'] + (f" ({record['error']})" if record['error'] else ''), 'Categoria': record['category'],
+             'Inizio (s)': round(record['start'], 3), 'Durata (s)': round(record['seconds'], 3), 'CPU (s)': round(record['cpu_seconds'], 3),
+             'RSS (MB)': record['rss_mb'], 'Picco RSS (MB)': record['peak_rss_mb'], 'Picco Python (MB)': record['python_peak_mb'],
+             'Dettagli': ', '.join(f"{key}={value}" for key, value in record['details'].items())} for record in sorted(profile['records'], key=lambda r: r['start'])]
+    return pd.DataFrame(rows, columns=columns).round({'RSS (MB)': 1, 'Picco RSS (MB)': 1, 'Picco Python (MB)': 2})
+
+
+def profile_json(profile):
+    data = {key: profile[key] for key in ('label', 'created', 'trace_memory')}
+    data['records'] = sorted(profile['records'], key=lambda r: r['start'])
+    return json.dumps(data, indent=2, default=str).encode('utf-8')
+
+
+def chrome_trace(profile):
+    # Formato Trace Event (eventi completi "X", microsecondi); i thread sono rinumerati in ordine di comparsa
+    threads = {}; events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': f"InfraTrack {profile['label'] or ''}".strip()}}]
+    for record in sorted(profile['records'], key=lambda r: r['start']):
+        tid = threads.setdefault(record['thread'], len(threads) + 1)
+        args = {'cpu_ms': round(record['cpu_seconds'] * 1000, 3), 'rss_mb': record['rss_mb'], 'peak_rss_mb': record['peak_rss_mb'],
+                'python_peak_mb': record['python_peak_mb'], **{key: str(value) for key, value in record['details'].items()}}
+        if record['error']: args['error'] = record['error']
+        events.append({'name': record['name'], 'cat': record['category'], 'ph': 'X', 'ts': round(record['start'] * 1e6, 1),
+                       'dur': round(record['seconds'] * 1e6, 1), 'pid': 1, 'tid': tid, 'args': args})
+    return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'created': profile['created']}}).encode('utf-8')
@@ -0,0 +1,56 @@
+# --- Avanzamento e Annullamento dei Caricamenti ---
+# Un dict condiviso tra il thread che analizza la baseline e lo script Streamlit che lo legge a ogni ciclo di
+# aggiornamento: fase corrente, byte letti dal parser, attività / assegnazioni / righe timephased raccolte.
+# report() è anche il punto di annullamento: se la richiesta di annullamento è attiva solleva IngestionCancelled,
+# così il caricamento si interrompe tra un blocco di elementi XML e il successivo senza scrivere cache.
+import os
+import threading
+import time
+
+REPORT_EVERY = 1024  # elementi XML tra due aggiornamenti (e due controlli di annullamento)
+
+
+class IngestionCancelled(Exception):
+    pass
+
+
+def new_progress(bytes_total=None):
+    return {'stage': "In coda", 'bytes_read': 0, 'bytes_total': bytes_total, 'tasks': 0, 'assignments': 0, 'timephased_rows': 0,
+            'cancel': threading.Event(), 'started': time.time(), 'updated': time.time()}
+
+
+def source_size(source):
+    # Dimensione del file (percorso, UploadedFile/BytesIO o file aperto); None se non ricavabile
+    if isinstance(source, (str, os.PathLike)): return os.path.getsize(source)
+    size = getattr(source, 'size', None)
+    if size is not None: return size
+    try: return os.fstat(source.fileno()).st_size
+    except (AttributeError, OSError, ValueError): return None
+
+
+def report(progress, stage=None, **counters):
+    if progress is None: return
+    if progress['cancel'].is_set(): raise IngestionCancelled("Caricamento annullato.")
+    if stage is not None: progress['stage'] = stage
+    progress.update(counters); progress['updated'] = time.time()
+
+
+def cancel(progress):
+    progress['cancel'].set()
+
+
+def progress_fraction(progress):
+    # Quota del file già letta dal parser (la scansione XML domina il tempo di caricamento); None se ignota
+    if not progress['bytes_total']: return None
+    return min(progress['bytes_read'] / progress['bytes_total'], 1.0)
+
+
+def _count(value):
+    return f"{value:,}".replace(",", ".")
+
+
+def progress_text(progress):
+    mb_read = progress['bytes_read'] / 2 ** 20; mb_total = (progress['bytes_total'] or 0) / 2 ** 20
+    size = f"{mb_read:.1f} / {mb_total:.1f} MB" if mb_total else f"{mb_read:.1f} MB"
+    return (f"{progress['stage']} — {size}, {_count(progress['tasks'])} attività, {_count(progress['assignments'])} assegnazioni, "
+            f"{_count(progress['timephased_rows'])} righe timephased ({time.time() - progress['started']:.0f} s)")
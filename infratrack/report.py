@@ -0,0 +1,100 @@
+# --- Report Excel in streaming (openpyxl write-only) ---
+# I fogli sono scritti riga per riga a blocchi (nessun albero di celle completo in memoria) e le larghezze
+# delle colonne sono stimate in modo vettoriale su un campione di righe. write_workbook serve sia i
+# download dell'app sia la CLI; build_project_report produce in un solo passaggio il workbook consolidato
+# di tutte le analisi (TUP/TUF, Curva S, istogrammi per tipo risorsa, attività critiche).
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from .analysis import (build_project_index, scurve_analysis, scurve_export_table, aggregate_resource_histogram, histogram_export_table,
+                       histogram_pivot_table, filter_critical_tasks, critical_display_table, DETAIL_RESOURCE_TYPES)
+from .resources import RESOURCE_TYPES
+
+WIDTH_SAMPLE_ROWS = 2000  # righe campionate (metà in testa, metà in coda) per stimare la larghezza delle colonne
+_CHUNK_ROWS = 5000
+
+
+def column_widths(df):
+    # Larghezza = max(lunghezza intestazione, lunghezza del testo più lungo nel campione) + 3, come l'autofit precedente
+    sample = df if len(df) <= WIDTH_SAMPLE_ROWS else df.iloc[np.r_[0:WIDTH_SAMPLE_ROWS // 2, len(df) - WIDTH_SAMPLE_ROWS // 2:len(df)]]
+    widths = []
+    for position, column in enumerate(df.columns):
+        try: values_len = sample.iloc[:, position].astype(str).str.len().max()
+        except Exception: values_len = 0
+        widths.append(int(max(values_len if pd.notna(values_len) else 0, len(str(column)))) + 3)
+    return widths
+
+
+def _header_cells(worksheet, columns):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+    side = Side(style='thin'); cells = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, value=str(column))
+        cell.font = Font(bold=True); cell.border = Border(left=side, right=side, top=side, bottom=side); cell.alignment = Alignment(horizontal='center', vertical='top')
+        cells.append(cell)
+    return cells
+
+
+def write_dataframe_sheet(workbook, df, sheet_name, index=False):
+    # Foglio write-only: larghezze impostate prima delle righe (obbligatorio in modalità streaming), poi blocchi
+    # di _CHUNK_ROWS righe convertiti in valori Python (NaN/NA -> cella vuota)
+    from openpyxl.utils import get_column_letter
+    if index: df = df.reset_index()
+    worksheet = workbook.create_sheet(title=sheet_name[:31])
+    for position, width in enumerate(column_widths(df)): worksheet.column_dimensions[get_column_letter(position + 1)].width = width
+    worksheet.append(_header_cells(worksheet, df.columns))
+    for first in range(0, len(df), _CHUNK_ROWS):
+        block = df.iloc[first:first + _CHUNK_ROWS].astype(object)
+        for row in block.where(block.notna(), None).to_numpy().tolist(): worksheet.append(row)
+    return worksheet
+
+
+def write_image_sheet(workbook, png_bytes, sheet_name='Grafico'):
+    from openpyxl.drawing.image import Image
+    worksheet = workbook.create_sheet(title=sheet_name[:31])
+    worksheet.add_image(Image(BytesIO(png_bytes)), 'A1')
+    return worksheet
+
+
+def write_workbook(sheets, target=None):
+    # sheets: lista di (nome, DataFrame[, index]) o (nome, PNG in bytes); target: percorso o file-like.
+    # Senza target restituisce il contenuto del file (download Streamlit).
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for sheet in sheets:
+        sheet_name, content = sheet[0], sheet[1]
+        if isinstance(content, (bytes, bytearray)): write_image_sheet(workbook, content, sheet_name)
+        else: write_dataframe_sheet(workbook, content, sheet_name, index=sheet[2] if len(sheet) > 2 else False)
+    if target is not None: workbook.save(target); return target
+    output = BytesIO(); workbook.save(output)
+    return output.getvalue()
+
+
+def project_report_sheets(project_data, start_date, finish_date, aggregation_level, slack_threshold, slack_column='TotalSlackDays', project_index=None):
+    # Fogli del report consolidato, nell'ordine del workbook; project_index già costruito (app) o calcolato qui (CLI)
+    project_index = project_index if project_index is not None else build_project_index(project_data); sheets = []
+    df_milestones = project_data.get('df_milestones_display')
+    if df_milestones is not None and not df_milestones.empty: sheets.append(('TerminiUtili', df_milestones))
+    all_tasks_data = project_data.get('all_tasks_data')
+    if all_tasks_data is not None and not all_tasks_data.empty:
+        _, aggregated_data = scurve_analysis(project_index, project_data.get('wbs_name_map', {}), start_date, finish_date, aggregation_level)
+        if aggregated_data is not None and not aggregated_data.empty: sheets.append(('Curva S', scurve_export_table(aggregated_data, aggregation_level)))
+    for resource_type in RESOURCE_TYPES:
+        aggregated_hist = aggregate_resource_histogram(project_index, resource_type, start_date, finish_date, aggregation_level)
+        if aggregated_hist.empty: continue
+        df_export = histogram_export_table(aggregated_hist, resource_type, aggregation_level); sheet_name = f"Istogramma {resource_type}"
+        df_pivot = histogram_pivot_table(df_export, aggregation_level) if resource_type in DETAIL_RESOURCE_TYPES and aggregation_level == 'Mensile' else None
+        sheets.append((sheet_name, df_pivot, True) if df_pivot is not None else (sheet_name, df_export))
+    if all_tasks_data is not None and not all_tasks_data.empty:
+        critical_tasks_in_period, _ = filter_critical_tasks(project_index, all_tasks_data, slack_threshold, start_date, finish_date, slack_column)
+        sheets.append(('Attivita_Critiche', critical_display_table(critical_tasks_in_period, slack_column)))
+    return sheets
+
+
+def build_project_report(project_data, output, start_date, finish_date, aggregation_level, slack_threshold, slack_column='TotalSlackDays', project_index=None):
+    # Workbook consolidato scritto in un solo passaggio; output = percorso/file-like, None = bytes. Restituisce (nomi fogli, risultato)
+    sheets = project_report_sheets(project_data, start_date, finish_date, aggregation_level, slack_threshold, slack_column, project_index)
+    return [sheet[0] for sheet in sheets], write_workbook(sheets, output)
@@ -0,0 +1,130 @@
+# --- Classificazione Risorse (Mezzi / Manodopera / Altro) ---
+# Le regole sono profili (dict, file JSON o YAML) compilati in un'unica regex ad alternanza: una sola scansione
+# del nome restituisce la regola di priorità più alta che vi compare. Il risultato è memorizzato per nome in una
+# cache LRU limitata (CLASSIFY_CACHE_SIZE nomi per classificatore: quello predefinito vive per tutto il processo del
+# server), quindi ogni nome distinto viene classificato una volta sola anche con migliaia di assegnazioni.
+import functools
+import json
+import os
+import re
+
+import pandas as pd
+
+LABOR_KEYWORDS = [
+    'operaio', 'ope ', 'addetto', 'squadra', 'assistente', 'tecnico', 'capo',
+    'resp', 'ingegnere', 'geometra', 'sorvegliante', 'pilota', 'gruista',
+    'autista', 'guardia', 'topografo', 'manovale', 'specializ', 'qualific',
+    'comune', 'direttore', 'coordinatore', 'carpentiere', 'ferraiolo', 'mo'
+]
+EQUIPMENT_KEYWORDS = [
+    'escavatore', 'pala', 'gru', 'terna', 'autocarro', 'camion', 'furgone',
+    'mezzo', 'macchina', 'attrezz', 'pompa', 'generatore', 'compressore',
+    'piattaforma', 'rullo', 'vibro', 'dumper', 'sonda', 'martello', 'tbm',
+    'fresa', 'veicolo', 'auto', 'locomotore', 'carro', 'sollevatore', 'muletto',
+    'mac', 'autogru', 'treno', 'posizionat', 'spritz', 'manitou', 'grader'
+]
+RESOURCE_TYPES = ['Manodopera', 'Mezzi', 'Altro']
+CLASSIFY_CACHE_SIZE = 4096  # nomi memorizzati per classificatore (LRU)
+# Profilo predefinito: Mezzi prima di Manodopera (priorità minore = valutata prima), sottostringhe senza confini di parola
+DEFAULT_PROFILE = {
+    'name': 'Predefinito', 'default_type': 'Altro',
+    'rules': [{'type': 'Mezzi', 'priority': 10, 'keywords': EQUIPMENT_KEYWORDS, 'word_boundary': False},
+              {'type': 'Manodopera', 'priority': 20, 'keywords': LABOR_KEYWORDS, 'word_boundary': False}]
+}
+
+
+def _normalize_name(resource_name):
+    return resource_name.lower().strip()
+
+
+def _validate_profile(profile):
+    if not isinstance(profile, dict) or not isinstance(profile.get('rules'), list):
+        raise ValueError("Profilo regole non valido: serve un oggetto con la lista 'rules'.")
+    for position, rule in enumerate(profile['rules']):
+        if not isinstance(rule, dict) or rule.get('type') not in RESOURCE_TYPES:
+            raise ValueError(f"Regola {position + 1}: 'type' deve essere uno tra {', '.join(RESOURCE_TYPES)}.")
+        if not isinstance(rule.get('keywords'), list) or not all(isinstance(keyword, str) and keyword for keyword in rule['keywords']):
+            raise ValueError(f"Regola {position + 1}: 'keywords' deve essere una lista di stringhe non vuote.")
+        if not isinstance(rule.get('priority', 0), (int, float)):
+            raise ValueError(f"Regola {position + 1}: 'priority' deve essere un numero.")
+    if profile.get('default_type', 'Altro') not in RESOURCE_TYPES:
+        raise ValueError(f"'default_type' deve essere uno tra {', '.join(RESOURCE_TYPES)}.")
+    return profile
+
+
+def load_profile_document(content, filename='profilo.json'):
+    # content: testo o bytes di un file JSON/YAML (YAML solo se PyYAML è installato); anche per i profili di rischio
+    if isinstance(content, bytes): content = content.decode('utf-8-sig')
+    if os.path.splitext(filename)[1].lower() in ('.yaml', '.yml'):
+        try: import yaml
+        except ImportError: raise ValueError("Profili YAML non supportati: installare PyYAML o usare JSON.")
+        try: profile = yaml.safe_load(content)
+        except yaml.YAMLError as e: raise ValueError(f"YAML non valido: {e}")
+    else:
+        try: profile = json.loads(content)
+        except json.JSONDecodeError as e: raise ValueError(f"JSON non valido: {e}")
+    return profile
+
+
+def parse_rule_profile(content, filename='profilo.json'):
+    return _validate_profile(load_profile_document(content, filename))
+
+
+def load_rule_profile(path):
+    with open(path, 'rb') as f: return parse_rule_profile(f.read(), path)
+
+
+def compile_classifier(profile=None):
+    # Regole ordinate per priorità (a parità, ordine del file); ogni regola è un gruppo nominato dentro un
+    # lookahead, così la regex prova tutte le regole a ogni posizione e l'alternanza restituisce la prima
+    # (la più prioritaria) che inizia in quel punto.
+    profile = _validate_profile(profile if profile is not None else DEFAULT_PROFILE)
+    rules = sorted(profile['rules'], key=lambda rule: rule.get('priority', 0))
+    alternatives = []
+    for position, rule in enumerate(rules):
+        keywords = '|'.join(re.escape(keyword.lower()) for keyword in sorted(set(rule['keywords']), key=len, reverse=True))
+        alternatives.append(f"(?P<r{position}>\\b(?:{keywords})\\b)" if rule.get('word_boundary') else f"(?P<r{position}>{keywords})")
+    pattern = re.compile(f"(?=(?:{'|'.join(alternatives)}))") if alternatives else None; types = [rule['type'] for rule in rules]
+    default_type = profile.get('default_type', 'Altro')
+    return {'name': profile.get('name', 'Personalizzato'), 'default_type': default_type, 'types': types, 'pattern': pattern,
+            'match': functools.lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(functools.partial(_match_type, pattern, types, default_type))}
+
+
+def _match_type(pattern, types, default_type, resource_name):
+    best = None
+    if pattern is not None:
+        for match in pattern.finditer(_normalize_name(resource_name)):
+            rule = int(match.lastgroup[1:])
+            if best is None or rule < best: best = rule
+            if best == 0: break
+    return default_type if best is None else types[best]
+
+
+def classify(classifier, resource_name):
+    if not resource_name: return classifier['default_type']
+    return classifier['match'](resource_name)
+
+
+_default_classifier = compile_classifier()
+
+
+def classify_resource(resource_name, classifier=None):
+    return classify(classifier or _default_classifier, resource_name)
+
+
+def resource_classification_table(resource_map, classifier=None):
+    # Tabella di debug UID / Nome / Tipo Classificato
+    classifier = classifier or _default_classifier
+    return pd.DataFrame([{'UID': uid, 'Nome': name, 'Tipo Classificato': classify(classifier, name)} for uid, name in resource_map.items()])
+
+
+def apply_resource_profile(project_data, classifier):
+    # Riclassifica un progetto già caricato (anche dalla cache su disco, che usa sempre il profilo predefinito):
+    # restituisce le tabelle da aggiornare in project_data / st.session_state
+    resource_map = project_data.get('resource_map', {}) or {}
+    updated = {'resource_classification_debug': resource_classification_table(resource_map, classifier)}
+    timephased_work_df = project_data.get('timephased_work_data')
+    if timephased_work_df is not None and not timephased_work_df.empty:
+        resource_types = {uid: classify(classifier, resource_map.get(uid, '')) for uid in timephased_work_df['ResourceUID'].unique()}
+        updated['timephased_work_data'] = timephased_work_df.assign(ResourceType=timephased_work_df['ResourceUID'].map(resource_types).astype('category'))
+    return updated
@@ -0,0 +1,349 @@
+# --- Analisi dei Rischi di Programma (simulazione Monte Carlo sulla rete CPM) ---
+# Ogni attività foglia riceve una distribuzione della durata (PERT o triangolare, in multipli della durata da
+# programma) dalla prima regola del profilo che la riguarda: prefisso WBS o tipo di una risorsa assegnata. La rete
+# è quella del CPM (cpm.build_network, riepiloghi collegati inclusi), con l'inizio da programma di ogni attività come
+# inizio minimo (date e termini TUP/TUF restano confrontabili con quelli del file), e i passaggi in avanti e all'indietro sono
+# vettoriali sulle iterazioni: i nodi sono raggruppati per livello topologico e ogni livello è un gruppo di
+# operazioni NumPy su una matrice nodi x iterazioni (massimo sugli archi entranti per fette contigue). Le iterazioni sono
+# divise in blocchi di CHUNK_ITERATIONS distribuiti su un pool di processi: ogni blocco ha il proprio seme
+# (SeedSequence.spawn), quindi a parità di seme il risultato non dipende dal numero di processi.
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from .cpm import build_network, forward_pass, compute_schedule, summary_leaves, working_day_dates, LINK_FS, LINK_FF, LINK_SF
+from .resources import load_profile_document, RESOURCE_TYPES
+
+DISTRIBUTIONS = ['pert', 'triangolare']
+DEFAULT_RISK_PROFILE = {'name': 'Predefinito', 'default': {'distribution': 'pert', 'optimistic': 0.9, 'most_likely': 1.0, 'pessimistic': 1.3}, 'rules': []}
+DEFAULT_ITERATIONS = 10000
+CHUNK_ITERATIONS = 500  # iterazioni per lavoro del pool (e per seme)
+BATCH_CELLS = 2 ** 22  # nodi x iterazioni per matrice in un blocco (32 MB in float64)
+CRITICAL_TOLERANCE = 1e-6  # giorni: flessibilità totale considerata nulla
+# Processi del pool: il server Streamlit è condiviso tra gli utenti, quindi al più 4 salvo INFRATRACK_RISK_WORKERS
+RISK_WORKERS = int(os.environ.get('INFRATRACK_RISK_WORKERS', '0')) or min(4, os.cpu_count() or 1)
+RISK_PERCENTILES = (50, 80)
+PERT_TABLE_POINTS = 4097  # punti della funzione quantile PERT tabulata
+
+_pool = None; _pool_key = None; _pool_lock = threading.Lock()  # una simulazione alla volta sul pool condiviso
+_model_tokens = itertools.count(1)
+_worker_network = None  # rete del modello nei processi del pool (initializer)
+
+
+# --- Profilo delle durate ---
+def _validate_distribution(values, where):
+    if not isinstance(values, dict): raise ValueError(f"{where}: serve un oggetto con optimistic / most_likely / pessimistic.")
+    if values.get('distribution', 'pert') not in DISTRIBUTIONS: raise ValueError(f"{where}: 'distribution' deve essere uno tra {', '.join(DISTRIBUTIONS)}.")
+    try: low, mode, high = (float(values.get(name, 1.0)) for name in ('optimistic', 'most_likely', 'pessimistic'))
+    except (TypeError, ValueError): raise ValueError(f"{where}: optimistic / most_likely / pessimistic devono essere numeri.")
+    if not 0 <= low <= mode <= high: raise ValueError(f"{where}: serve 0 <= optimistic <= most_likely <= pessimistic (multipli della durata).")
+    return {'distribution': values.get('distribution', 'pert'), 'optimistic': low, 'most_likely': mode, 'pessimistic': high}
+
+
+def validate_risk_profile(profile):
+    # Regole nell'ordine del file: vale la prima che riguarda l'attività ('wbs': prefisso o lista di prefissi,
+    # 'resource_type': tipo di una risorsa assegnata); le altre attività usano 'default'
+    if not isinstance(profile, dict) or not isinstance(profile.get('rules', []), list):
+        raise ValueError("Profilo di rischio non valido: serve un oggetto con la lista 'rules'.")
+    rules = []
+    for position, rule in enumerate(profile.get('rules', [])):
+        where = f"Regola {position + 1}"
+        # (idempotente: un profilo già validato ha entrambe le chiavi, una delle due a None)
+        if not isinstance(rule, dict) or (rule.get('wbs') is None) == (rule.get('resource_type') is None): raise ValueError(f"{where}: indicare 'wbs' oppure 'resource_type'.")
+        if rule.get('resource_type') is not None and rule['resource_type'] not in RESOURCE_TYPES: raise ValueError(f"{where}: 'resource_type' deve essere uno tra {', '.join(RESOURCE_TYPES)}.")
+        wbs = rule.get('wbs'); wbs = [wbs] if isinstance(wbs, str) else wbs
+        if wbs is not None and (not isinstance(wbs, list) or not all(isinstance(code, str) and code for code in wbs)): raise ValueError(f"{where}: 'wbs' deve essere un codice o una lista di codici.")
+        rules.append({**_validate_distribution(rule, where), 'wbs': wbs, 'resource_type': rule.get('resource_type')})
+    return {'name': profile.get('name', 'Personalizzato'), 'default': _validate_distribution(profile.get('default', DEFAULT_RISK_PROFILE['default']), "default"), 'rules': rules}
+
+
+def parse_risk_profile(content, filename='rischi.json'):
+    return validate_risk_profile(load_profile_document(content, filename))
+
+
+def load_risk_profile(path):
+    with open(path, 'rb') as f: return parse_risk_profile(f.read(), path)
+
+
+def duration_rules(task_table, assignments, resource_types, profile):
+    # Indice della regola per attività (len(rules) = default). resource_types: UID risorsa -> tipo classificato
+    rules = profile['rules']; rule_index = np.full(len(task_table), len(rules), dtype=np.int64)
+    unassigned = np.ones(len(task_table), dtype=bool)
+    wbs = task_table['WBS'].astype(str)
+    task_types = None
+    if assignments is not None and not assignments.empty and any(rule['resource_type'] for rule in rules):
+        assigned_types = pd.DataFrame({'UID': assignments['TaskUID'], 'Tipo': assignments['ResourceUID'].astype(object).map(resource_types)}).dropna()
+        task_types = assigned_types.groupby('Tipo')['UID'].agg(set)
+    for position, rule in enumerate(rules):
+        if rule['wbs']: matches = np.zeros(len(task_table), dtype=bool)
+        else: matches = task_table['UID'].isin(task_types.get(rule['resource_type'], set()) if task_types is not None else set()).to_numpy()
+        for code in rule['wbs'] or []: matches |= ((wbs == code) | wbs.str.startswith(code + '.')).to_numpy()
+        matches = matches & unassigned; rule_index[matches] = position; unassigned &= ~matches
+    return rule_index
+
+
+# --- Modello di simulazione ---
+def _level_edges(level, sources, targets, target_duration, lag_days):
+    # Archi ordinati per livello del nodo calcolato, poi per "rango" (k-esimo arco entrante del nodo) e per numero di
+    # archi entranti decrescente: in ogni livello il blocco di rango k contiene un arco per ciascuno dei primi nodi
+    # (quelli con più di k archi), quindi il massimo / minimo per nodo è una sequenza di operazioni su fette
+    # contigue. Per livello: intervallo di archi, nodi calcolati, (inizio, numero) dei blocchi di rango > 0 e
+    # intervallo degli archi che sottraggono la durata del nodo calcolato (target_duration)
+    degree = np.bincount(targets, minlength=len(level)); by_target = np.argsort(targets, kind='stable')
+    rank = np.empty(len(targets), dtype=np.int64); sorted_targets = targets[by_target]
+    rank[by_target] = np.arange(len(targets)) - np.searchsorted(sorted_targets, sorted_targets)
+    edge_order = np.lexsort((targets, -degree[targets], rank, level[targets])); targets = targets[edge_order]; rank = rank[edge_order]
+    bounds = np.flatnonzero(np.diff(level[targets])) + 1; duration_edges = np.flatnonzero(target_duration[edge_order])
+    groups = []
+    for lo, hi in zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(targets)].tolist()):
+        if hi <= lo: continue
+        rank_starts = lo + np.flatnonzero(np.diff(np.r_[-1, rank[lo:hi]])); rank_counts = np.diff(np.r_[rank_starts, hi])
+        blocks = list(zip((rank_starts[1:] - lo).tolist(), rank_counts[1:].tolist()))
+        groups.append((lo, hi, targets[lo:lo + rank_counts[0]], blocks, *np.searchsorted(duration_edges, [lo, hi]).tolist()))
+    return {'source': sources[edge_order], 'lag': lag_days[edge_order], 'duration_edges': duration_edges, 'duration_nodes': targets[duration_edges], 'groups': groups}
+
+
+def build_risk_model(project_data, project_index, profile=None):
+    # Rete, durate, regole e TUP/TUF preparati una volta; model['network'] (solo array) va ai processi del pool
+    profile = validate_risk_profile(profile if profile is not None else DEFAULT_RISK_PROFILE)
+    tasks = project_data['all_tasks_data']; links = project_data.get('df_links')
+    if links is None: raise ValueError("Rete delle attività non disponibile: rianalizzare la baseline (dati di una versione precedente).")
+    calendar = project_index['calendars'][project_index['project_calendar_uid']]
+    task_uids = tasks['UID'].to_numpy(dtype=object); is_summary = tasks['Summary'].to_numpy(dtype=bool)
+    pred, succ, link_type, lag_days, n_virtual = build_network(task_uids, tasks['WBS'].to_numpy(dtype=object), is_summary, links,
+                                                               project_data['minutes_per_day'], int(calendar['weekmask'].sum()) or 5)
+    n_tasks = len(tasks); n_nodes = n_tasks + n_virtual
+    durations = np.concatenate([np.where(is_summary, 0.0, tasks['DurationDays'].to_numpy(dtype=np.float64)), np.zeros(n_virtual)])
+    # Inizio da programma delle attività foglia (date, vincoli e avanzamento del file) come inizio minimo: a durate
+    # invariate la simulazione riproduce le date del file, salvo dove i collegamenti le spingono più avanti
+    project_start = np.datetime64(project_data['project_start_date'], 'D'); busdaycal = calendar['busdaycal']
+    scheduled_start = _working_day_offsets(project_start, pd.to_datetime(tasks['Start']).to_numpy('datetime64[D]'), busdaycal)
+    start_bound = np.concatenate([np.where(is_summary | np.isnan(scheduled_start), 0.0, np.maximum(scheduled_start, 0.0)), np.zeros(n_virtual)])
+    # Livelli topologici (cammino più lungo in numero di archi) in avanti e all'indietro; i nodi in un ciclo restano fuori
+    by_pred = np.argsort(pred, kind='stable'); order, level = forward_pass(n_nodes, pred[by_pred], succ[by_pred], np.ones(len(pred)))
+    in_network = np.zeros(n_nodes, dtype=bool); in_network[order] = True
+    keep = in_network[pred] & in_network[succ]; pred = pred[keep]; succ = succ[keep]; link_type = link_type[keep]; lag_days = lag_days[keep]
+    by_succ = np.argsort(succ, kind='stable'); _, reverse_level = forward_pass(n_nodes, succ[by_succ], pred[by_succ], np.ones(len(pred)))
+    from_finish = (link_type == LINK_FS) | (link_type == LINK_FF); to_finish = (link_type == LINK_FF) | (link_type == LINK_SF)
+    network = {'token': next(_model_tokens), 'n_tasks': n_tasks, 'n_nodes': n_nodes, 'durations': durations, 'start_bound': start_bound, 'in_network': in_network,
+               # In avanti: ES[s] = max(inizio minimo, ES|EF[p] + ritardo - D[s] per FF/SF), riga sorgente nella matrice [ES; EF]
+               'forward': _level_edges(level.astype(np.int64), pred + from_finish * n_nodes, succ, to_finish, lag_days),
+               # All'indietro: LS[p] = min(fine - D[p], LS|LF[s] - ritardo - D[p] per FS/FF), riga sorgente in [LS; LF]
+               'backward': _level_edges(reverse_level.astype(np.int64), succ + to_finish * n_nodes, pred, from_finish, -lag_days)}
+    # Regole di durata: un gruppo di nodi per regola con almeno un'attività di durata positiva
+    resource_types = {}
+    classification = project_data.get('resource_classification_debug')
+    if classification is not None and not classification.empty: resource_types = dict(zip(classification['UID'], classification['Tipo Classificato']))
+    rule_index = duration_rules(tasks, project_data.get('df_assignments'), resource_types, profile)
+    sampled = ~is_summary & (durations[:n_tasks] > 0) & in_network[:n_tasks]
+    network['groups'] = [{'nodes': np.flatnonzero(sampled & (rule_index == position)), **distribution, 'quantiles': _pert_quantiles(distribution)}
+                         for position, distribution in enumerate(profile['rules'] + [profile['default']])]
+    # TUP/TUF: nodo dell'attività scelta per ogni chiave e ultimo giorno lavorativo entro il termine (offset dall'inizio progetto)
+    milestones = project_data.get('df_milestones')
+    if milestones is None: milestones = pd.DataFrame(columns=['TupTufKey', 'UID', 'Name', 'Finish'])
+    # (un TUP/TUF di riepilogo finisce con l'ultima delle sue attività foglia)
+    node_by_uid = pd.Series(np.arange(n_tasks), index=task_uids); node_by_uid = node_by_uid[~node_by_uid.index.duplicated()]
+    milestone_nodes = milestones['UID'].map(node_by_uid).fillna(-1).to_numpy(dtype=np.int64)
+    leaf_milestones = np.flatnonzero((milestone_nodes >= 0) & ~is_summary[np.maximum(milestone_nodes, 0)])
+    summary_milestones = np.flatnonzero((milestone_nodes >= 0) & is_summary[np.maximum(milestone_nodes, 0)])
+    owner, members = summary_leaves(tasks['WBS'].to_numpy(dtype=object), is_summary, milestone_nodes[summary_milestones])
+    owner = np.concatenate([leaf_milestones, summary_milestones[owner]]); members = np.concatenate([milestone_nodes[leaf_milestones], members])
+    by_owner = np.argsort(owner, kind='stable'); owner = owner[by_owner]; members = members[by_owner]
+    starts = np.r_[0, np.flatnonzero(np.diff(owner)) + 1] if len(owner) else np.zeros(0, dtype=np.int64)
+    network['milestones'] = {'count': len(milestones), 'members': members, 'starts': starts, 'rows': owner[starts]}
+    deadline_days = _working_day_offsets(project_start, pd.to_datetime(milestones['Finish']).to_numpy('datetime64[D]') + 1, busdaycal) - 1
+    return {'network': network, 'rule_index': rule_index, 'profile': profile, 'milestones': milestones[['TupTufKey', 'Name', 'Finish']].reset_index(drop=True),
+            'deadline_days': deadline_days, 'project_start': project_start, 'busdaycal': busdaycal, 'links': (pred, succ, link_type, lag_days)}
+
+
+def _working_day_offsets(project_start, dates, busdaycal):
+    # Date -> giorni lavorativi dal primo giorno lavorativo del progetto fino al giorno prima (NaN per NaT)
+    offsets = np.full(len(dates), np.nan)
+    if busdaycal is None or not len(dates): return offsets
+    valid = ~np.isnat(dates); first_day = np.busday_offset(project_start, 0, roll='forward', busdaycal=busdaycal)
+    offsets[valid] = np.busday_count(first_day, dates[valid], busdaycal=busdaycal)
+    return offsets
+
+
+def scheduled_milestone_days(model):
+    # Giorno di fine di ogni TUP/TUF con le durate da programma (CPM deterministico con gli stessi inizi minimi):
+    # riferimento per la simulazione, a moltiplicatori unitari deve coincidere con ogni iterazione
+    network = model['network']; pred, succ, link_type, lag_days = model['links']
+    schedule = compute_schedule(network['durations'], pred, succ, link_type, lag_days, network['start_bound'])
+    return _milestone_days(network, schedule['EarlyStart'][:, None], schedule['EarlyFinish'][:, None])[:, 0]
+
+
+def _pert_quantiles(distribution):
+    # PERT = Beta(1 + 4(m-a)/(b-a), 1 + 4(b-m)/(b-a)) su [a, b]: funzione quantile tabulata una volta per regola su una
+    # griglia uniforme di probabilità, così l'estrazione è un'interpolazione diretta (senza ricerca) di numeri uniformi
+    low, mode, high = distribution['optimistic'], distribution['most_likely'], distribution['pessimistic']
+    if distribution['distribution'] != 'pert' or high <= low: return None
+    alpha = 1 + 4 * (mode - low) / (high - low); beta = 1 + 4 * (high - mode) / (high - low)
+    x = np.linspace(0.0, 1.0, 16 * PERT_TABLE_POINTS); density = x ** (alpha - 1) * (1 - x) ** (beta - 1)
+    cdf = np.concatenate([[0.0], np.cumsum((density[1:] + density[:-1]) / 2)]); cdf /= cdf[-1]
+    return low + (high - low) * np.interp(np.linspace(0.0, 1.0, PERT_TABLE_POINTS), cdf, x)
+
+
+# --- Simulazione (eseguita nei processi del pool) ---
+def _sample_multipliers(rng, group, shape):
+    low, mode, high = group['optimistic'], group['most_likely'], group['pessimistic']
+    if high <= low: return np.full(shape, low)
+    if group['distribution'] == 'triangolare': return rng.triangular(low, mode, high, size=shape)
+    quantiles = group['quantiles']; position = rng.random(shape) * (len(quantiles) - 1)
+    index = position.astype(np.intp); position -= index
+    return quantiles[index] + position * (quantiles[index + 1] - quantiles[index])
+
+
+def _propagate(values, durations, edges, reduce, bound):
+    # Un livello topologico alla volta: candidati degli archi (archi x iterazioni) ridotti per nodo calcolato.
+    # values: matrice [inizi; fine] (2n x iterazioni), aggiornata sul posto; bound(nodes): limite iniziale degli inizi
+    n_nodes = len(durations); source = edges['source']; lag = edges['lag']; duration_edges = edges['duration_edges']; duration_nodes = edges['duration_nodes']
+    for lo, hi, nodes, blocks, d_lo, d_hi in edges['groups']:
+        candidates = values[source[lo:hi]]; candidates += lag[lo:hi, None]
+        if d_hi > d_lo: candidates[duration_edges[d_lo:d_hi] - lo] -= durations[duration_nodes[d_lo:d_hi]]
+        node_starts = candidates[:len(nodes)]
+        for start, count in blocks: reduce(node_starts[:count], candidates[start:start + count], out=node_starts[:count])
+        reduce(node_starts, bound(nodes), out=node_starts)
+        values[nodes] = node_starts; values[nodes + n_nodes] = node_starts + durations[nodes]
+
+
+def _simulate_batch(network, rng, n_iterations):
+    n_nodes = network['n_nodes']; n_tasks = network['n_tasks']; in_network = network['in_network']
+    durations = np.repeat(network['durations'][:, None], n_iterations, axis=1)
+    for group in network['groups']: durations[group['nodes']] *= _sample_multipliers(rng, group, (len(group['nodes']), n_iterations))
+    start_bound = network['start_bound']
+    early = np.empty((2 * n_nodes, n_iterations)); early[:n_nodes] = start_bound[:, None]; early[n_nodes:] = early[:n_nodes] + durations
+    _propagate(early, durations, network['forward'], np.maximum, lambda nodes: start_bound[nodes, None])
+    early_start, early_finish = early[:n_nodes], early[n_nodes:]
+    project_finish = early_finish[in_network].max(axis=0) if in_network.any() else np.zeros(n_iterations)
+    late = np.empty((2 * n_nodes, n_iterations)); late[:n_nodes] = project_finish - durations; late[n_nodes:] = project_finish
+    _propagate(late, durations, network['backward'], np.minimum, lambda nodes: project_finish - durations[nodes])
+    critical = ((late[:n_tasks] - early_start[:n_tasks]) <= CRITICAL_TOLERANCE) & in_network[:n_tasks, None]
+    return _milestone_days(network, early_start, early_finish).T, np.maximum(np.ceil(project_finish - 1e-9) - 1, 0), critical.sum(axis=1)
+
+
+def _milestone_days(network, early_start, early_finish):
+    # Ultimo giorno lavorativo occupato, come in cpm.compute_cpm (milestone: il giorno di inizio); termini x iterazioni
+    milestones = network['milestones']; members = milestones['members']
+    milestone_days = np.full((milestones['count'], early_start.shape[1]), np.nan)
+    if len(members):
+        member_days = np.maximum(np.ceil(early_finish[members] - 1e-9) - 1, np.floor(early_start[members] + 1e-9))
+        member_days[~network['in_network'][members]] = np.nan  # attività in un ciclo: data non calcolabile
+        milestone_days[milestones['rows']] = np.maximum.reduceat(member_days, milestones['starts'], axis=0)
+    return milestone_days
+
+
+def _simulate_chunk(network, seed, n_iterations):
+    # Blocchi di al più BATCH_CELLS celle: la memoria per processo non dipende dal numero di iterazioni
+    rng = np.random.default_rng(seed); batch = max(1, min(n_iterations, BATCH_CELLS // max(network['n_nodes'], 1)))
+    milestone_days, finish_days = [], []; critical_counts = np.zeros(network['n_tasks'], dtype=np.int64)
+    for first in range(0, n_iterations, batch):
+        batch_milestones, batch_finish, batch_critical = _simulate_batch(network, rng, min(batch, n_iterations - first))
+        milestone_days.append(batch_milestones); finish_days.append(batch_finish); critical_counts += batch_critical
+    return np.concatenate(milestone_days).astype(np.float32), np.concatenate(finish_days).astype(np.float32), critical_counts
+
+
+def _init_worker(network):
+    global _worker_network
+    _worker_network = network
+
+
+def _simulate_worker_chunk(seed, n_iterations):
+    return _simulate_chunk(_worker_network, seed, n_iterations)
+
+
+def _reset_pool():
+    global _pool, _pool_key
+    if _pool is not None: _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None; _pool_key = None
+
+
+def _risk_pool(workers, network):
+    # Pool persistente per numero di processi e modello (avvio "spawn": il processo dell'app ha thread attivi, un fork
+    # li copierebbe a metà). La rete arriva una volta per processo con l'initializer, i blocchi portano solo seme e numero
+    global _pool, _pool_key
+    if _pool is None or _pool_key != (workers, network['token']):
+        _reset_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker, initargs=(network,))
+        _pool_key = (workers, network['token'])
+    return _pool
+
+
+def simulate_schedule_risk(model, iterations=DEFAULT_ITERATIONS, seed=0, workers=None):
+    # Giorni lavorativi di fine per TUP/TUF (iterazioni x termini) e di fine progetto, iterazioni in cui ogni
+    # attività è critica. workers=1: nel processo corrente
+    n_chunks = math.ceil(iterations / CHUNK_ITERATIONS)
+    chunk_sizes = [min(CHUNK_ITERATIONS, iterations - position * CHUNK_ITERATIONS) for position in range(n_chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks); network = model['network']
+    workers = max(1, min(workers or RISK_WORKERS, n_chunks))
+    results = None
+    if workers > 1:
+        with _pool_lock:
+            try: results = list(_risk_pool(workers, network).map(_simulate_worker_chunk, seeds, chunk_sizes))
+            except BrokenProcessPool: _reset_pool()  # processo del pool terminato (es. memoria): si ricalcola qui
+    if results is None: results = [_simulate_chunk(network, chunk_seed, size) for chunk_seed, size in zip(seeds, chunk_sizes)]
+    return {'iterations': iterations, 'seed': seed, 'milestone_days': np.concatenate([result[0] for result in results]),
+            'finish_days': np.concatenate([result[1] for result in results]), 'critical_counts': sum(result[2] for result in results)}
+
+
+# --- Risultati ---
+def _days_to_dates(model, days):
+    return pd.to_datetime(working_day_dates(model['project_start'], np.asarray(days, dtype=np.float64), model['busdaycal']))
+
+
+def _percentile_days(days, percentile):
+    # Percentile su giorni interi (metodo 'inverted_cdf': un giorno effettivamente simulato); NaN se nessun valore
+    days = days[~np.isnan(days)]
+    return float(np.percentile(days, percentile, method='inverted_cdf')) if len(days) else np.nan
+
+
+def milestone_risk_table(model, result):
+    # Per TUP/TUF: termine da programma, date P50/P80 e probabilità di rispettarlo
+    milestones = model['milestones']
+    if milestones.empty: return pd.DataFrame()
+    days = result['milestone_days'].astype(np.float64)
+    table = pd.DataFrame({'Termine': milestones['TupTufKey'], 'Nome': milestones['Name'], 'Fine da Programma': pd.to_datetime(milestones['Finish'])})
+    for percentile in RISK_PERCENTILES: table[f'Fine P{percentile}'] = _days_to_dates(model, [_percentile_days(days[:, column], percentile) for column in range(days.shape[1])])
+    with np.errstate(invalid='ignore'): on_time = (days <= model['deadline_days']).mean(axis=0) * 100
+    table['Probabilità Rispetto (%)'] = np.where(np.isnan(model['deadline_days']) | np.isnan(days).all(axis=0), np.nan, np.round(on_time, 1))
+    return table
+
+
+def project_finish_summary(model, result):
+    # Date P50/P80 di fine progetto (None senza iterazioni valide) e distribuzione (giorno -> iterazioni) per il grafico
+    days = result['finish_days'].astype(np.float64)
+    percentiles = {percentile: _days_to_dates(model, [_percentile_days(days, percentile)])[0] for percentile in RISK_PERCENTILES}
+    percentiles = {percentile: value if pd.notna(value) else None for percentile, value in percentiles.items()}
+    values, counts = np.unique(days, return_counts=True)
+    return percentiles, pd.DataFrame({'Date': _days_to_dates(model, values), 'Iterazioni': counts})
+
+
+def criticality_table(model, result, task_table, slack_column='TotalSlackDays'):
+    # Indice di criticità (% di iterazioni con flessibilità totale nulla) delle attività foglia, dal più alto
+    index = result['critical_counts'] / max(result['iterations'], 1) * 100
+    leaf = ~task_table['Summary'].to_numpy(dtype=bool) & (index > 0)
+    rules = [f"WBS {', '.join(rule['wbs'])}" if rule['wbs'] else rule['resource_type'] for rule in model['profile']['rules']] + ['Predefinita']
+    table = pd.DataFrame({'UID': task_table['UID'].to_numpy()[leaf], 'WBS': task_table['WBS'].to_numpy()[leaf], 'Name': task_table['Name'].to_numpy()[leaf],
+                          'Indice di Criticità (%)': np.round(index[leaf], 1), 'Flessibilità da Programma (gg)': task_table[slack_column].to_numpy()[leaf],
+                          'Regola Durata': np.asarray(rules, dtype=object)[model['rule_index'][leaf]]})
+    return table.sort_values('Indice di Criticità (%)', ascending=False, kind='stable', ignore_index=True)
+
+
+def risk_export_tables(model, result, milestone_table, critical_table):
+    # Fogli Excel dell'analisi: parametri e fine progetto, TUP/TUF (date gg/mm/aaaa), indici di criticità
+    percentiles, _ = project_finish_summary(model, result)
+    summary = pd.DataFrame({'Parametro': ['Profilo', 'Iterazioni', 'Seme'] + [f'Fine Progetto P{percentile}' for percentile in percentiles],
+                            'Valore': [model['profile'].get('name', ''), result['iterations'], result['seed']] + [value.strftime('%d/%m/%Y') if value is not None else '' for value in percentiles.values()]})
+    sheets = [('Rischi Sintesi', summary)]
+    if not milestone_table.empty:
+        date_columns = ['Fine da Programma'] + [f'Fine P{percentile}' for percentile in RISK_PERCENTILES]
+        sheets.append(('Rischi TUP-TUF', milestone_table.assign(**{column: milestone_table[column].dt.strftime('%d/%m/%Y') for column in date_columns})))
+    sheets.append(('Indici di Criticità', critical_table))
+    return sheets
@@ -0,0 +1,35 @@
+# --- Schema Compatto delle Tabelle di Progetto ---
+# all_tasks_data e timephased_work_data restano in st.session_state (e nella cache Parquet) per tutta la sessione:
+# date come datetime64[s] a mezzanotte (pandas non ha colonne datetime64[D]; i calcoli le leggono come giorni con
+# to_numpy('datetime64[D]') senza passare da oggetti date), codici ripetuti (durata, calendario, origine della
+# flessibilità, UID e tipo risorsa) come categorical, lavoro in float32 e giorni di flessibilità in int32.
+# Il costo resta float64: in float32 i centesimi si perdono già oltre ~100.000 €. Nome, UID e WBS sono quasi
+# sempre distinti per attività: restano stringhe (Arrow con pandas >= 3, un buffer unico senza oggetti per riga).
+import pandas as pd
+
+DATE_DTYPE = 'datetime64[s]'
+TASK_DTYPES = {'Start': DATE_DTYPE, 'Finish': DATE_DTYPE, 'Duration': 'category', 'CalendarUID': 'category', 'SlackSource': 'category',
+               'DurationDays': 'float32', 'TotalSlackDays': 'int32', 'CPMEarlyStart': DATE_DTYPE, 'CPMEarlyFinish': DATE_DTYPE, 'CPMLateStart': DATE_DTYPE, 'CPMLateFinish': DATE_DTYPE}
+TIMEPHASED_DTYPES = {'Date': DATE_DTYPE, 'ResourceUID': 'category', 'ResourceType': 'category', 'WorkMinutes': 'float32'}
+# PredecessorLink e assegnazioni attività / risorsa (rete per la simulazione dei rischi): tipo, ritardo e formato
+# hanno pochi valori distinti, le risorse si ripetono su molte attività
+LINK_DTYPES = {'SuccessorUID': 'str', 'PredecessorUID': 'str', 'Type': 'category', 'LinkLag': 'category', 'LagFormat': 'category'}
+ASSIGNMENT_DTYPES = {'TaskUID': 'str', 'ResourceUID': 'category'}
+# Tabelle di project_data con schema compatto (la cache le riporta allo schema: Parquet rilegge le date in ms)
+TABLE_DTYPES = {'all_tasks_data': TASK_DTYPES, 'timephased_work_data': TIMEPHASED_DTYPES, 'df_milestones': {'Start': DATE_DTYPE, 'Finish': DATE_DTYPE},
+                'df_links': LINK_DTYPES, 'df_assignments': ASSIGNMENT_DTYPES}
+
+
+def compact_table(df, dtypes):
+    # Converte solo le colonne presenti e non ancora nel tipo compatto (idempotente)
+    changes = {column: dtype for column, dtype in dtypes.items() if column in df.columns and df[column].dtype != dtype}
+    return df.astype(changes) if changes else df
+
+
+def scalar_date(value):
+    # Valore di una colonna data -> datetime.date (None se NaT/mancante), per le date di progetto mostrate nei widget
+    return value.date() if pd.notna(value) else None
+
+
+def table_memory_mb(df):
+    return 0.0 if df is None else df.memory_usage(deep=True).sum() / 2 ** 20
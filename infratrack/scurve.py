@@ -0,0 +1,126 @@
+# --- Motore di Distribuzione Costi Giornalieri (Curva S) ---
+# Il costo di ogni attività è spalmato uniformemente sui giorni lavorativi di [Start, Finish] secondo il
+# calendario dell'attività (o del progetto) con un array delle differenze per calendario, moltiplicato
+# per la maschera dei giorni lavorativi: nessuna lista di dict giorno per giorno.
+# L'appartenenza attività->giorni resta in forma sparsa (inizio/fine per attività + codice WBS) e
+# gli insiemi WBS del giorno si ricostruiscono solo quando servono (vista giornaliera).
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from .calendars import calendar_codes, compile_project_calendars, count_working_days, is_working_day
+
+
+def _to_day_ordinals(values):
+    return pd.to_datetime(pd.Series(values), errors='coerce').to_numpy(dtype='datetime64[D]')
+
+
+def distribute_costs(tasks_to_distribute, calendars=None, project_calendar_uid=None):
+    # calendars: calendari compilati per UID (calendars.project_calendars); None = Standard lun-ven
+    if calendars is None: calendars, project_calendar_uid = compile_project_calendars(None, project_calendar_uid)
+    start = _to_day_ordinals(tasks_to_distribute['Start']); finish = _to_day_ordinals(tasks_to_distribute['Finish'])
+    cost = tasks_to_distribute['Cost'].to_numpy(dtype=np.float64)
+    valid = ~np.isnat(start) & ~np.isnat(finish) & (finish >= start)
+    start = start[valid]; finish = finish[valid]; cost = cost[valid]
+    wbs_codes, wbs_categories = pd.factorize(tasks_to_distribute['WBS'].astype(str)[valid])
+    if len(start) == 0:
+        return {'origin': None, 'daily_values': np.zeros(0), 'cumulative_values': np.zeros(1), 'active_tasks': np.zeros(0, dtype=np.int64),
+                'task_start': np.zeros(0, dtype=np.int64), 'task_finish': np.zeros(0, dtype=np.int64),
+                'task_wbs': wbs_codes, 'wbs_categories': wbs_categories}
+    task_calendar_uids = tasks_to_distribute['CalendarUID'].to_numpy(dtype=object)[valid] if 'CalendarUID' in tasks_to_distribute else [None] * len(start)
+    task_calendar, task_calendars = calendar_codes(task_calendar_uids, calendars, project_calendar_uid)
+    working_days = np.zeros(len(start), dtype=np.int64)
+    for code, calendar in enumerate(task_calendars):
+        in_calendar = task_calendar == code
+        working_days[in_calendar] = count_working_days(calendar, start[in_calendar], finish[in_calendar])
+    # Attività senza giorni lavorativi nell'intervallo: costo sui giorni di calendario (gruppo -1, senza maschera)
+    task_calendar = np.where(working_days == 0, -1, task_calendar)
+    origin = start.min()
+    task_start = (start - origin).astype(np.int64); task_finish = (finish - origin).astype(np.int64)
+    value_per_day = cost / np.where(working_days == 0, task_finish - task_start + 1, working_days)
+    horizon = int(task_finish.max()) + 2
+    all_days = origin + np.arange(horizon - 1)
+    daily_values = np.zeros(horizon - 1); active_tasks = np.zeros(horizon - 1, dtype=np.int64)
+    for code in np.unique(task_calendar):
+        group = task_calendar == code; group_start = task_start[group]; group_end = task_finish[group] + 1
+        # Array delle differenze: +valore il primo giorno, -valore il giorno dopo la fine
+        value_diff = np.bincount(group_start, weights=value_per_day[group], minlength=horizon) - np.bincount(group_end, weights=value_per_day[group], minlength=horizon)
+        count_diff = np.bincount(group_start, minlength=horizon) - np.bincount(group_end, minlength=horizon)
+        working = np.ones(horizon - 1, dtype=bool) if code < 0 else is_working_day(task_calendars[code], all_days)
+        group_values = np.cumsum(value_diff)[:-1]; group_active = np.cumsum(count_diff)[:-1]
+        group_values[group_active == 0] = 0.0  # niente residui di arrotondamento nei giorni senza attività
+        daily_values += np.where(working, group_values, 0.0); active_tasks += np.where(working, group_active, 0)
+    # Somme prefisse (cumulative_values[i] = costo dei giorni 0..i-1): totale di qualsiasi periodo in O(1)
+    cumulative_values = np.concatenate(([0.0], np.cumsum(daily_values)))
+    return {'origin': origin, 'daily_values': daily_values, 'cumulative_values': cumulative_values, 'active_tasks': active_tasks,
+            'task_start': task_start, 'task_finish': task_finish, 'task_wbs': wbs_codes, 'wbs_categories': wbs_categories}
+
+
+def _period_slice(distribution, start_date, finish_date):
+    origin = distribution['origin']; n_days = len(distribution['daily_values'])
+    first = 0 if start_date is None else int((np.datetime64(start_date, 'D') - origin).astype(np.int64))
+    last = n_days - 1 if finish_date is None else int((np.datetime64(finish_date, 'D') - origin).astype(np.int64))
+    return max(first, 0), min(last, n_days - 1)
+
+
+def wbs_lists_by_day(distribution, day_offsets):
+    # Insiemi WBS attivi per gli offset richiesti (ordinati). Scansione degli eventi inizio/fine: tra due
+    # eventi consecutivi l'insieme non cambia, quindi ogni insieme distinto viene costruito una sola volta.
+    day_offsets = np.asarray(day_offsets, dtype=np.int64)
+    if len(day_offsets) == 0: return []
+    task_start = distribution['task_start']; task_finish = distribution['task_finish']; task_wbs = distribution['task_wbs']
+    categories = distribution['wbs_categories'].to_numpy(dtype=object)  # accesso per elemento senza Index di pandas
+    first, last = int(day_offsets.min()), int(day_offsets.max())
+    overlap = (task_start <= last) & (task_finish >= first)
+    starts = np.maximum(task_start[overlap], first); ends = np.minimum(task_finish[overlap], last) + 1; codes = task_wbs[overlap]
+    order_start = np.argsort(starts, kind='stable'); order_end = np.argsort(ends, kind='stable')
+    active = Counter(); i_start = i_end = 0; current_list = []; dirty = True; result = []
+    for day in day_offsets:
+        while i_end < len(order_end) and ends[order_end[i_end]] <= day:
+            code = codes[order_end[i_end]]; active[code] -= 1
+            if active[code] == 0: del active[code]
+            i_end += 1; dirty = True
+        while i_start < len(order_start) and starts[order_start[i_start]] <= day:
+            active[codes[order_start[i_start]]] += 1; i_start += 1; dirty = True
+        if dirty: current_list = sorted(categories[code] for code in active); dirty = False
+        result.append(current_list)
+    return result
+
+
+def daily_cost_series(distribution, start_date=None, finish_date=None, with_wbs=False):
+    # Serie giornaliera nel periodo (solo i giorni in cui almeno un'attività riceve costo, come il vecchio groupby per data)
+    columns = ['Date', 'Value'] + (['WBS_List'] if with_wbs else [])
+    if distribution['origin'] is None: return pd.DataFrame(columns=columns)
+    first, last = _period_slice(distribution, start_date, finish_date)
+    if first > last: return pd.DataFrame(columns=columns)
+    offsets = np.flatnonzero(distribution['active_tasks'][first:last + 1] > 0) + first
+    series = pd.DataFrame({'Date': pd.to_datetime(distribution['origin'] + offsets), 'Value': distribution['daily_values'][offsets]})
+    if with_wbs: series['WBS_List'] = wbs_lists_by_day(distribution, offsets)
+    return series
+
+
+def period_cost(distribution, start_date=None, finish_date=None):
+    # Costo totale del periodo dalle somme prefisse
+    if distribution['origin'] is None: return 0.0
+    first, last = _period_slice(distribution, start_date, finish_date)
+    if first > last: return 0.0
+    return float(distribution['cumulative_values'][last + 1] - distribution['cumulative_values'][first])
+
+
+def monthly_cost_series(distribution, start_date=None, finish_date=None):
+    # Totali mensili (Date = fine mese) tra il primo e l'ultimo giorno con costo nel periodo, come il resample('ME')
+    # della serie giornaliera ma con una sottrazione di somme prefisse per mese
+    columns = ['Date', 'Value']
+    if distribution['origin'] is None: return pd.DataFrame(columns=columns)
+    first, last = _period_slice(distribution, start_date, finish_date)
+    if first > last: return pd.DataFrame(columns=columns)
+    active = np.flatnonzero(distribution['active_tasks'][first:last + 1] > 0)
+    if len(active) == 0: return pd.DataFrame(columns=columns)
+    origin = distribution['origin']; first_day = origin + first + active[0]; last_day = origin + first + active[-1]
+    months = np.arange(first_day.astype('datetime64[M]'), last_day.astype('datetime64[M]') + 1)
+    bounds = (months.astype('datetime64[D]') - origin).astype(np.int64)
+    bounds = np.clip(np.append(bounds, last + 1), first, last + 1)
+    cumulative_values = distribution['cumulative_values']
+    month_ends = (months + 1).astype('datetime64[D]') - np.timedelta64(1, 'D')
+    return pd.DataFrame({'Date': pd.to_datetime(month_ends), 'Value': cumulative_values[bounds[1:]] - cumulative_values[bounds[:-1]]})
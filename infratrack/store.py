@@ -0,0 +1,140 @@
+# --- Archivio Progetti Condiviso tra le Sessioni (memoria di processo) ---
+# Le sessioni Streamlit dello stesso processo che aprono la stessa baseline (stesso SHA-256) ricevono gli stessi
+# oggetti: tabelle di progetto e indice sono tenuti una sola volta e condivisi senza copie. Le tabelle restano di
+# sola lettura grazie al Copy-on-Write di pandas (predefinito da pandas >= 3, attivato da infratrack/__init__.py con
+# pandas 2.x): le modifiche di una sessione, es. la riclassificazione delle risorse, producono nuove tabelle nella
+# sessione. Gli array NumPy dell'indice sono marcati non scrivibili. Ogni sessione tiene un "lease": quando la sessione lo rilascia (nuovo file, reset, sessione chiusa
+# e raccolta dal garbage collector) il conteggio dei riferimenti scende. Oltre il budget di memoria vengono
+# rimossi, dal meno usato di recente, solo i progetti senza sessioni attive. Due sessioni che caricano insieme
+# la stessa baseline attendono un solo parsing.
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+
+import numpy as np
+import pandas as pd
+
+from .analysis import build_project_index
+from .cache import file_digest, cache_key, load_project_for_key, remove_cached_project
+from .profiling import stage
+from .progress import report, IngestionCancelled
+
+STORE_MAX_BYTES = int(float(os.environ.get('INFRATRACK_STORE_MAX_MB', '1024')) * 1024 * 1024)
+
+_lock = threading.RLock()  # rientrante: i finalizzatori dei lease possono scattare mentre il lock è tenuto
+_entries = OrderedDict(); _loading = {}
+
+
+class _Lease:
+    # Riferimento di una sessione a un progetto dell'archivio (solo come bersaglio del weakref.finalize)
+    __slots__ = ('key', '__weakref__')
+
+    def __init__(self, key): self.key = key
+
+
+def _freeze(value):
+    # Array NumPy dell'indice in sola lettura (anche dentro dict/liste annidati)
+    if isinstance(value, np.ndarray): value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values(): _freeze(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value: _freeze(item)
+    return value
+
+
+def _value_bytes(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)): return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, np.ndarray): return value.nbytes
+    if isinstance(value, dict): return sum(_value_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)): return sum(_value_bytes(item) for item in value)
+    return 0
+
+
+def _release(entry):
+    # Il lease punta alla voce su cui è stato preso: dopo un'invalidazione non tocca la voce ricaricata
+    with _lock:
+        entry['refs'] = max(entry['refs'] - 1, 0); entry['last_used'] = time.time()
+        _evict(STORE_MAX_BYTES)
+
+
+def _evict(max_bytes):
+    # Dal meno usato di recente; i progetti ancora aperti in qualche sessione non liberano memoria e restano
+    total = sum(entry['bytes'] for entry in _entries.values())
+    for key in list(_entries):
+        if total <= max_bytes: break
+        if _entries[key]['refs'] == 0: total -= _entries.pop(key)['bytes']
+
+
+def _lease(key, entry):
+    lease = _Lease(key); entry['refs'] += 1; entry['last_used'] = time.time(); _entries.move_to_end(key)
+    weakref.finalize(lease, _release, entry)
+    return lease
+
+
+def _load_entry(source, key, label, cache_dir, profile, progress, member):
+    project_data, from_cache = load_project_for_key(source, key, cache_dir, profile, progress, member)
+    report(progress, "Indice di progetto")
+    with stage(profile, "Indice di progetto", 'analysis'): project_index = _freeze(build_project_index(project_data))
+    return {'project_data': project_data, 'project_index': project_index, 'label': label, 'origin': 'disco' if from_cache else 'parsing',
+            'bytes': _value_bytes(project_data) + _value_bytes(project_index), 'refs': 0, 'loaded': time.time(), 'last_used': time.time()}
+
+
+def _wait_for_other_session(future, progress):
+    # Attesa annullabile del caricamento avviato da un'altra sessione; se quella lo annulla, il chiamante riprova in proprio
+    report(progress, "Attesa del caricamento avviato da un'altra sessione")
+    while not wait([future], timeout=0.2).done: report(progress)
+    if not isinstance(future.exception(), IngestionCancelled): future.result()
+
+
+def acquire_project(source, label=None, cache_dir=None, profile=None, progress=None, member=None):
+    # Progetto condiviso per il contenuto di source: dict con project_data, project_index, digest, origin
+    # ('memoria', 'disco' o 'parsing') e lease. La sessione deve conservare il lease finché usa le tabelle.
+    # progress: infratrack.progress (avanzamento e annullamento, anche durante l'attesa di un'altra sessione);
+    # member: file XML scelto in un archivio .zip
+    report(progress, "Lettura upload (SHA-256)")
+    with stage(profile, "Lettura upload (SHA-256)", 'io'): digest = file_digest(source, member)
+    key = cache_key(digest)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None: return {'project_data': entry['project_data'], 'project_index': entry['project_index'], 'digest': digest, 'origin': 'memoria', 'lease': _lease(key, entry)}
+        future = _loading.get(key); owner = future is None
+        if owner: future = _loading[key] = Future()
+    if not owner:
+        with stage(profile, "Attesa caricamento di un'altra sessione", 'io'): _wait_for_other_session(future, progress)
+        return acquire_project(source, label, cache_dir, profile, progress, member)
+    try: entry = _load_entry(source, key, label, cache_dir, profile, progress, member)
+    except BaseException as e:
+        with _lock: _loading.pop(key, None)
+        future.set_exception(e); raise
+    with _lock:
+        _entries[key] = entry; _loading.pop(key, None)
+        lease = _lease(key, entry); _evict(STORE_MAX_BYTES)
+    future.set_result(True)
+    return {'project_data': entry['project_data'], 'project_index': entry['project_index'], 'digest': digest, 'origin': entry['origin'], 'lease': lease}
+
+
+def invalidate_project(digest, cache_dir=None):
+    # Rimuove una baseline dall'archivio e dalla cache su disco: la prossima apertura la rianalizza.
+    # Le sessioni che la stanno usando conservano le proprie tabelle fino al rilascio del lease.
+    key = cache_key(digest)
+    with _lock: _entries.pop(key, None)
+    remove_cached_project(key, cache_dir)
+
+
+def clear_project_store():
+    with _lock: _entries.clear()
+
+
+def store_summary():
+    # Tabella per l'app: un progetto per riga, dal più recente
+    with _lock: entries = list(_entries.items())
+    rows = [{'Baseline': entry['label'] or key[:12], 'Memoria (MB)': round(entry['bytes'] / 2 ** 20, 1), 'Sessioni': entry['refs'],
+             'Origine': entry['origin'], 'Ultimo uso': time.strftime('%H:%M:%S', time.localtime(entry['last_used']))} for key, entry in reversed(entries)]
+    return pd.DataFrame(rows, columns=['Baseline', 'Memoria (MB)', 'Sessioni', 'Origine', 'Ultimo uso'])
+
+
+def store_usage():
+    with _lock: return sum(entry['bytes'] for entry in _entries.values()), STORE_MAX_BYTES
@@ -0,0 +1,77 @@
+# --- Estrazione Colonnare dei Task MSPDI ---
+# Ogni <Task> viene visitato una sola volta (un giro sui figli diretti) e i testi finiscono in
+# liste per colonna; date, costi e durate sono poi convertiti in blocco con pandas/NumPy.
+import numpy as np
+import pandas as pd
+import re
+
+from .cpm import TAG_PREDECESSOR_LINK, CPM_COLUMNS, append_predecessor_link
+from .durations import parse_iso_durations, format_durations
+from .schema import DATE_DTYPE
+
+MSP_NS = 'http://schemas.microsoft.com/project'
+TUP_TUF_PATTERN = re.compile(r'(?i)((?:TUP|TUF)\s*\d*)')
+TASK_FIELDS = ('UID', 'Name', 'WBS', 'Start', 'Finish', 'EarlyFinish', 'LateFinish', 'Cost', 'Duration', 'Milestone', 'Summary', 'CalendarUID')
+_TAG_TO_FIELD = {'{' + MSP_NS + '}' + field: field for field in TASK_FIELDS}
+TASK_COLUMNS = ["UID", "Name", "Start", "Finish", "Duration", "DurationDays", "Cost", "Milestone", "Summary", "WBS", "TotalSlackDays", "CalendarUID",
+                "SlackSource"] + CPM_COLUMNS
+MILESTONE_COLUMNS = ['TupTufKey', 'UID', 'Name', 'Start', 'Finish', 'Duration']
+
+
+def new_task_columns():
+    return {field: [] for field in TASK_FIELDS}
+
+
+def append_task(columns, task_elem, link_columns=None):
+    # link_columns (cpm.new_link_columns): raccoglie anche i PredecessorLink nello stesso giro sui figli
+    values = dict.fromkeys(TASK_FIELDS); link_elems = []
+    for child in task_elem:
+        field = _TAG_TO_FIELD.get(child.tag)
+        if field is not None and values[field] is None: values[field] = child.text or ''
+        elif child.tag == TAG_PREDECESSOR_LINK: link_elems.append(child)
+    for field in TASK_FIELDS: columns[field].append(values[field])
+    if link_columns is not None:
+        for link_elem in link_elems: append_predecessor_link(link_columns, values['UID'], link_elem)
+
+
+def _to_dates(values):
+    return pd.to_datetime(pd.Series(values, dtype=object), format='ISO8601', errors='coerce').dt.normalize()
+
+
+def build_task_table(columns, minutes_per_day):
+    # Tabella completa (incluso UID 0) con colonne tipizzate; DurationSeconds serve ai TUP/TUF, DurationDays
+    # (giorni lavorativi) al CPM e alla simulazione dei rischi
+    raw = pd.DataFrame(columns, columns=list(TASK_FIELDS))
+    start = _to_dates(raw['Start']); finish = _to_dates(raw['Finish'])
+    early_finish = _to_dates(raw['EarlyFinish']); late_finish = _to_dates(raw['LateFinish'])
+    # Flessibilità esportata da MS Project; NaN se mancano EarlyFinish/LateFinish (completata dal CPM nel loader)
+    slack = (late_finish - early_finish).dt.days.astype(np.float64)
+    milestone_text = raw['Milestone'].fillna('0').str.lower()
+    duration_seconds = parse_iso_durations(raw['Duration'])
+    return pd.DataFrame({
+        "UID": raw['UID'], "Name": raw['Name'].fillna(""),
+        "Start": start.astype(DATE_DTYPE), "Finish": finish.astype(DATE_DTYPE),
+        "Duration": format_durations(raw['Duration'], minutes_per_day), "DurationDays": np.nan_to_num(duration_seconds, nan=0.0) / 60.0 / minutes_per_day,
+        "Cost": pd.to_numeric(raw['Cost'], errors='coerce').fillna(0).to_numpy(dtype=np.float64) / 100.0,
+        "Milestone": milestone_text.isin(['1', 'true']).to_numpy(), "Summary": (raw['Summary'].fillna('0') == '1').to_numpy(),
+        "WBS": raw['WBS'].fillna(""), "TotalSlackDays": slack, "CalendarUID": raw['CalendarUID'].fillna("-1"),
+        "DurationSeconds": np.nan_to_num(duration_seconds, nan=0.0),
+    })
+
+
+def select_milestones(task_table):
+    # TUP/TUF: una riga per chiave, preferendo l'attività con durata (la più lunga, a parità la prima nel file) alla
+    # milestone pura; ordinate per data di inizio (date mancanti in testa). None se il progetto non ne contiene
+    keys = task_table['Name'].str.extract(TUP_TUF_PATTERN, expand=False)
+    matched = task_table.loc[keys.notna(), ['UID', 'Name', 'Start', 'Finish', 'Duration', 'DurationSeconds']].assign(TupTufKey=keys[keys.notna()].str.upper().str.strip())
+    if matched.empty: return None
+    selected = matched.sort_values('DurationSeconds', ascending=False, kind='stable').drop_duplicates('TupTufKey')
+    return selected.sort_values('Start', na_position='first', kind='stable')[MILESTONE_COLUMNS].reset_index(drop=True)
+
+
+def build_milestones(milestones):
+    # Tabella "Termini Utili Contrattuali" dell'app e dei report (date gg/mm/aaaa)
+    if milestones is None or milestones.empty: return None
+    return pd.DataFrame({"Nome Completo": milestones['Name'], "Durata": milestones['Duration'],
+                         "Data Inizio": milestones['Start'].dt.strftime("%d/%m/%Y").fillna("N/D"),
+                         "Data Fine": milestones['Finish'].dt.strftime("%d/%m/%Y").fillna("N/D")})
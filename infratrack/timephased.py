@@ -0,0 +1,124 @@
+# --- Lavoro Timephased (TimephasedData Type=1) in forma vettoriale ---
+# Durante la scansione si raccolgono solo le stringhe Start/Finish/Value; le durate PTxHyMzS sono
+# interpretate in blocco e ogni intervallo viene ripartito sui giorni lavorativi del calendario della
+# risorsa (prima tutto il lavoro finiva sul giorno di Start, falsando gli istogrammi per i record su più giorni).
+from lxml import etree
+import numpy as np
+import pandas as pd
+
+from .calendars import calendar_codes, is_working_day, compile_project_calendars, STANDARD_CALENDAR_UID
+from .durations import parse_iso_durations
+from .resources import classify_resource
+from .schema import TIMEPHASED_DTYPES, compact_table
+
+MSP_NS = 'http://schemas.microsoft.com/project'
+_Q = '{' + MSP_NS + '}'
+TAG_RESOURCE_UID = _Q + 'ResourceUID'; TAG_TASK_UID = _Q + 'TaskUID'; TAG_TIMEPHASED = _Q + 'TimephasedData'
+TAG_START = _Q + 'Start'; TAG_FINISH = _Q + 'Finish'; TAG_VALUE = _Q + 'Value'
+_TIMEPHASED_WORK_FIELDS = etree.XPath('msp:TimephasedData[msp:Type="1"][msp:Start][msp:Value]/*[self::msp:Start or self::msp:Finish or self::msp:Value]',
+                                     namespaces={'msp': MSP_NS})
+TIMEPHASED_COLUMNS = ['Date', 'ResourceUID', 'ResourceType', 'WorkMinutes']
+ASSIGNMENT_COLUMNS = ['TaskUID', 'ResourceUID']
+WORKDAY_START = pd.Timedelta(hours=8)
+
+
+def new_timephased_columns():
+    return {'ResourceUID': [], 'Start': [], 'Finish': [], 'Value': []}
+
+
+def new_assignment_columns():
+    return {column: [] for column in ASSIGNMENT_COLUMNS}
+
+
+def append_assignment(columns, assignment_elem, assignment_columns=None):
+    # Un'unica XPath compilata (valutata in C) restituisce Start/Finish/Value dei TimephasedData Type=1
+    # in ordine di documento; ogni record inizia con il suo Start (ordine fissato dallo schema MSPDI).
+    # assignment_columns (new_assignment_columns): raccoglie anche la coppia attività / risorsa
+    resource_uid = assignment_elem.findtext(TAG_RESOURCE_UID)
+    if not resource_uid: return
+    if assignment_columns is not None:
+        assignment_columns['TaskUID'].append(assignment_elem.findtext(TAG_TASK_UID)); assignment_columns['ResourceUID'].append(resource_uid)
+    starts = columns['Start']; finishes = columns['Finish']; values = columns['Value']; n_before = len(starts)
+    for field in _TIMEPHASED_WORK_FIELDS(assignment_elem):
+        tag = field.tag
+        if tag == TAG_START: starts.append(field.text); finishes.append(None); values.append(None)
+        elif tag == TAG_FINISH: finishes[-1] = field.text
+        else: values[-1] = field.text
+    columns['ResourceUID'].extend([resource_uid] * (len(starts) - n_before))
+
+
+def parse_work_minutes(values):
+    # "PT8H0M0S" -> 480.0; valori senza 'PT' trattati come minuti numerici
+    values = pd.Series(values, dtype=object)
+    is_duration = values.str.contains('PT', regex=False, na=False).to_numpy()
+    minutes = pd.to_numeric(values.where(~is_duration), errors='coerce').to_numpy(dtype=np.float64, copy=True)
+    minutes[is_duration] = parse_iso_durations(values[is_duration]) / 60.0
+    return minutes
+
+
+def spread_spans(first_day, last_day, values, span_calendar, calendars):
+    # Ripartisce ogni valore sui giorni lavorativi di [first_day, last_day] (datetime64[D]) secondo il calendario
+    # calendars[span_calendar]; se l'intervallo non contiene giorni lavorativi il valore è ripartito su tutti i
+    # suoi giorni di calendario.
+    n_days = (last_day - first_day).astype(np.int64) + 1
+    span_index = np.repeat(np.arange(len(n_days)), n_days)
+    offsets = np.arange(len(span_index)) - np.repeat(np.cumsum(n_days) - n_days, n_days)
+    days = first_day[span_index] + offsets
+    working = np.zeros(len(days), dtype=bool); day_calendar = span_calendar[span_index]
+    for code, calendar in enumerate(calendars):
+        in_calendar = day_calendar == code
+        working[in_calendar] = is_working_day(calendar, days[in_calendar])
+    working_count = np.bincount(span_index, weights=working, minlength=len(n_days))
+    no_working_days = working_count == 0
+    keep = working | no_working_days[span_index]
+    divisor = np.where(no_working_days, n_days, working_count)
+    return span_index[keep], days[keep], (values / divisor)[span_index[keep]]
+
+
+def build_timephased_work(columns, resource_map, resource_calendars=None, calendars=None, project_calendar_uid=STANDARD_CALENDAR_UID, workday_start=WORKDAY_START):
+    # resource_calendars: UID risorsa -> UID calendario; calendars: definizioni risolte (calendars.resolve_calendars)
+    raw = pd.DataFrame(columns)
+    if raw.empty: return pd.DataFrame(columns=TIMEPHASED_COLUMNS)
+    start = pd.to_datetime(raw['Start'], format='ISO8601', errors='coerce')
+    finish = pd.to_datetime(raw['Finish'], format='ISO8601', errors='coerce')
+    work_minutes = parse_work_minutes(raw['Value'])
+    valid = (start.notna() & (work_minutes > 0)).to_numpy()
+    first_day = start.to_numpy(dtype='datetime64[D]')
+    # Finish è esclusivo: se cade prima dell'inizio della giornata lavorativa (00:00, 08:00 del giorno dopo)
+    # quel giorno non riceve lavoro
+    finish_day = finish.dt.normalize()
+    last_day = finish_day.where(finish - finish_day > workday_start, finish_day - pd.Timedelta(days=1)).to_numpy(dtype='datetime64[D]')
+    last_day = np.where(np.isnat(last_day) | (last_day < first_day), first_day, last_day)
+    compiled, project_calendar_uid = compile_project_calendars(calendars, project_calendar_uid)
+    valid_resource_uids = raw['ResourceUID'].to_numpy(dtype=object)[valid]
+    span_calendar, span_calendars = calendar_codes(pd.Series(valid_resource_uids, dtype=object).map(resource_calendars or {}), compiled, project_calendar_uid)
+    span_index, days, minutes = spread_spans(first_day[valid], last_day[valid], work_minutes[valid], span_calendar, span_calendars)
+    resource_uids = valid_resource_uids[span_index]
+    daily_df = pd.DataFrame({'Date': days, 'ResourceUID': resource_uids, 'WorkMinutes': minutes})
+    daily_df = daily_df.groupby(['ResourceUID', 'Date'], sort=True, as_index=False)['WorkMinutes'].sum()
+    # Schema compatto prima della classificazione: la mappa UID -> tipo lavora sulle sole categorie
+    daily_df = compact_table(daily_df, TIMEPHASED_DTYPES)
+    resource_types = {uid: classify_resource(resource_map.get(uid, '')) for uid in daily_df['ResourceUID'].cat.categories}
+    daily_df['ResourceType'] = daily_df['ResourceUID'].map(resource_types).astype('category')
+    return daily_df[TIMEPHASED_COLUMNS]
+
+
+def build_work_matrix(timephased_work_df, resource_map):
+    # Matrice densa ore di lavoro risorsa x giorno: righe = (tipo, nome risorsa) ordinate, così ogni tipo è un
+    # intervallo contiguo di righe; colonne = giorni con lavoro, ordinati (asse compatto, niente giorni vuoti).
+    # Le viste giornaliere/mensili per tipo diventano fette e riduzioni della matrice. Somme per cella in float64,
+    # matrice tenuta in float32 (metà memoria nell'archivio condiviso: le ore giornaliere hanno ~7 cifre significative,
+    # i totali di analysis sommano in float64 e arrotondano i valori mostrati)
+    # Chiavi (tipo, nome) calcolate sulle risorse distinte, poi riportate alle righe con i codici della factorize
+    resource_codes, resource_uids = pd.factorize(timephased_work_df['ResourceUID'])
+    resource_types = timephased_work_df['ResourceType'].to_numpy(dtype=object)[np.unique(resource_codes, return_index=True)[1]]
+    keys = pd.DataFrame({'ResourceType': resource_types, 'ResourceName': pd.Series(resource_uids, dtype=object).map(resource_map).fillna('Sconosciuto').to_numpy(dtype=object)})
+    key_codes = keys.groupby(['ResourceType', 'ResourceName'], sort=True).ngroup().to_numpy()
+    rows = keys.drop_duplicates().sort_values(['ResourceType', 'ResourceName'])
+    row_codes = key_codes[resource_codes]
+    day_codes, days = pd.factorize(timephased_work_df['Date'].to_numpy(dtype='datetime64[D]'), sort=True)
+    matrix = np.bincount(row_codes * len(days) + day_codes, weights=timephased_work_df['WorkMinutes'].to_numpy(dtype=np.float64) / 60.0,
+                         minlength=len(rows) * len(days)).astype(np.float32).reshape(len(rows), len(days))
+    row_types = rows['ResourceType'].to_numpy()
+    type_rows = {resource_type: (int(np.searchsorted(row_types, resource_type, side='left')), int(np.searchsorted(row_types, resource_type, side='right'))) for resource_type in pd.unique(row_types)}
+    return {'hours': matrix, 'days': np.asarray(days, dtype='datetime64[D]'), 'resource_names': rows['ResourceName'].to_numpy(), 'type_rows': type_rows}
@@ -0,0 +1,103 @@
+# --- Gerarchia WBS (albero con puntatori al padre e profondità) ---
+# Costruita una volta per progetto dai codici WBS di tutte le attività (anche quelle senza nome) e da wbs_name_map
+# per i nomi: i codici WBS sono nodi (anche i livelli intermedi senza nome), con un nodo radice virtuale (indice 0,
+# codice ''). L'antenato comune di un insieme di codici è l'antenato comune dei due nodi estremi in ordine di visita
+# (preordine), calcolato risalendo i puntatori al padre per livello, non confrontando stringhe carattere per
+# carattere ("1.10.1" e "1.12.3" hanno come antenato "1", mai il codice inesistente "1.1"). Dopo la costruzione
+# l'albero è di sola lettura (infratrack.store lo condivide tra le sessioni): un codice sconosciuto si risolve sul
+# primo dei suoi troncamenti presente, senza aggiungere nodi. Le etichette sono memorizzate per insieme di codici
+# (frozenset) solo per una chiamata a summary_labels: nella vista giornaliera gli insiemi si ripetono da un giorno all'altro.
+import pandas as pd
+
+
+def _parent_code(code):
+    return code.rsplit('.', 1)[0] if '.' in code else ''
+
+
+def _add_node(tree, code):
+    # Solo durante la costruzione: aggiunge il codice e i suoi antenati mancanti
+    position = tree['position'].get(code)
+    if position is not None: return position
+    parent = _add_node(tree, _parent_code(code))
+    position = tree['position'][code] = len(tree['codes'])
+    tree['codes'].append(code); tree['parent'].append(parent); tree['depth'].append(tree['depth'][parent] + 1); tree['names'].append(None)
+    return position
+
+
+def build_wbs_tree(wbs_name_map, wbs_codes=()):
+    # wbs_codes: codici WBS di tutte le attività (es. all_tasks_data['WBS']); i nomi vengono da wbs_name_map
+    tree = {'codes': [''], 'position': {'': 0}, 'parent': [0], 'depth': [0], 'names': [None]}
+    for code in pd.unique(pd.Series(wbs_codes, dtype=object).dropna().astype(str)):
+        if code: _add_node(tree, code)
+    for code, name in (wbs_name_map or {}).items(): tree['names'][_add_node(tree, str(code))] = name
+    tree['preorder'] = _preorder(tree)
+    return tree
+
+
+def wbs_node(tree, code):
+    # Posizione del nodo; per un codice sconosciuto quella del primo troncamento presente (0 = radice). Non modifica l'albero
+    position = tree['position']
+    while code not in position: code = _parent_code(code)
+    return position[code]
+
+
+def _preorder(tree):
+    # Posizione di ogni nodo nella visita in profondità
+    children = [[] for _ in tree['codes']]
+    for node, parent in enumerate(tree['parent']):
+        if node: children[parent].append(node)
+    preorder = [0] * len(children); stack = [0]; visit = 0
+    while stack:
+        node = stack.pop(); preorder[node] = visit; visit += 1
+        stack.extend(reversed(children[node]))
+    return preorder
+
+
+def _pair_ancestor(parent, depth, a, b):
+    while depth[a] > depth[b]: a = parent[a]
+    while depth[b] > depth[a]: b = parent[b]
+    while a != b: a = parent[a]; b = parent[b]
+    return a
+
+
+def common_ancestor(tree, wbs_codes):
+    # Nodo antenato comune più profondo dell'insieme (il nodo stesso per un solo codice, 0 = nessun antenato comune);
+    # un codice sconosciuto conta come il suo primo troncamento presente, che ne contiene il nodo mancante
+    if not wbs_codes: return 0
+    nodes = [wbs_node(tree, str(code)) for code in wbs_codes]; preorder = tree['preorder']
+    # I nodi dell'insieme stanno tutti nel sottoalbero dell'antenato comune dei due estremi in preordine
+    first = min(nodes, key=preorder.__getitem__); last = max(nodes, key=preorder.__getitem__)
+    return _pair_ancestor(tree['parent'], tree['depth'], first, last)
+
+
+def _named_ancestor(tree, node):
+    # Primo nodo con nome risalendo da node (compreso); 0 se nessuno
+    parent = tree['parent']; names = tree['names']
+    while node != 0 and names[node] is None: node = parent[node]
+    return node
+
+
+def summary_label(tree, wbs_codes):
+    # Etichetta "Riepilogo WBS" di un giorno: un solo codice -> riepilogo padre (o l'attività stessa se il padre non ha
+    # nome); più codici -> il riepilogo reale più vicino che li contiene tutti; nessun antenato comune -> progetto
+    names = tree['names']
+    if not wbs_codes: return "N/D"
+    if len(wbs_codes) == 1:
+        code = str(next(iter(wbs_codes))); node = tree['position'].get(code)
+        parent = tree['parent'][node] if node is not None else tree['position'].get(_parent_code(code), 0)
+        return names[parent] if parent != 0 and names[parent] else ((names[node] if node is not None else None) or "Attività Sconosciuta")
+    named = _named_ancestor(tree, common_ancestor(tree, wbs_codes))
+    if named != 0: return names[named]
+    root = tree['position'].get('1')
+    return names[root] if root is not None and names[root] else "Riepilogo Progetto"
+
+
+def summary_labels(tree, wbs_lists):
+    # summary_label per ogni insieme di codici, calcolata una volta per insieme distinto (memoria locale alla chiamata)
+    labels = {}; result = []
+    for wbs_codes in wbs_lists:
+        key = wbs_codes if isinstance(wbs_codes, frozenset) else frozenset(wbs_codes)
+        label = labels.get(key)
+        if label is None: label = labels[key] = summary_label(tree, key)
+        result.append(label)
+    return result